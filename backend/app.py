@@ -1,31 +1,59 @@
 import os
+import sys
+
+if __name__ == "__main__":
+    # Run through server.py so spawned worker processes re-import that thin module as the
+    # main script instead of this one (see server.py); app is then imported once, as "app"
+    import runpy
+    runpy.run_path(os.path.join(os.path.dirname(os.path.abspath(__file__)), "server.py"), run_name="__main__")
+    sys.exit(0)
+
 import tempfile
 import json
-from typing import TypedDict, List, Dict
+import base64
+import hashlib
+import shutil
+import threading
+import queue
+import contextvars
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from typing import TypedDict, List, Dict, Callable
 import PyPDF2
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, Response
 from flask_cors import CORS
 from pymongo import MongoClient
 from langchain_core.output_parsers import JsonOutputParser
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_groq import ChatGroq
-from langchain_community.document_loaders import PyPDFLoader, TextLoader, Docx2txtLoader
+from langchain_community.document_loaders import TextLoader, Docx2txtLoader
 from langsmith import Client
 from langchain_core.tracers import LangChainTracer
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain.vectorstores import FAISS
 from langchain_community.embeddings import HuggingFaceEmbeddings
 from langchain.retrievers import MultiQueryRetriever
+from langchain_core.retrievers import BaseRetriever
 from langgraph.graph import END, StateGraph
+from bson.errors import InvalidId
 from bson.objectid import ObjectId
 from google.oauth2 import service_account
 from googleapiclient.discovery import build
 from dotenv import load_dotenv
-from datetime import datetime
+from datetime import datetime, timedelta
 import bcrypt
 import traceback
 import gridfs
 from werkzeug.utils import secure_filename
+from embedding_store import EmbeddingStore, CachedEmbeddings
+from document_stream import iter_pdf_pages, iter_chunks
+from llm_cache import TieredLLMCache, evict_reply, fresh_generation, stream_with_cache
+from retrieval import CoverageRetriever, COVERAGE_METHODS, pack_documents
+from question_stream import ArrayItemParser, sse_event
+from classroom_queries import student_classrooms
+from db_indexes import ensure_indexes
+from quiz_analytics import ANALYTICS_VERSION, record_evaluation, retract_evaluation, summarize, subject_key, form_key
+from question_stats import QUESTION_STATS_VERSION, record_response, retract_response, item_statistics
 
 app = Flask(__name__)
 CORS(app, resources={
@@ -49,8 +77,14 @@ try:
     user_response_collection = db["user_response"]
     teacher_auth = db['teacher']
     classrooms = db['classrooms']
+    classroom_jobs_collection = db["classroom_jobs"]
+    llm_cache_collection = db["llm_cache"]
+    quiz_analytics_collection = db["quiz_analytics"]
+    question_stats_collection = db["question_stats"]
     fs = gridfs.GridFS(db)
     print("MongoDB connection successful")
+    # In the background so an unreachable server does not hold up startup
+    threading.Thread(target=ensure_indexes, args=(db,), name="ensure-indexes", daemon=True).start()
 except Exception as e:
     print(f"MongoDB connection failed: {str(e)}")
 
@@ -74,62 +108,244 @@ LANGCHAIN_PROJECT = os.getenv("LANGCHAIN_PROJECT", "quiz-generator")
 UPLOAD_FOLDER = tempfile.mkdtemp()
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
 
+# Document chunking / embedding parameters (part of the index cache key)
+EMBEDDING_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+CHUNK_SIZE = 2000
+CHUNK_OVERLAP = 200
+# Characters buffered before each incremental split, and chunks embedded per index update
+SPLIT_WINDOW = 20 * CHUNK_SIZE
+INDEX_BUILD_BATCH = 256
+
+# Question generation fan-out: questions per LLM call, parallel calls, and rounds to refill failed slots
+QUESTIONS_PER_CALL = int(os.getenv("QUESTIONS_PER_CALL", 5))
+GENERATION_CONCURRENCY = int(os.getenv("GENERATION_CONCURRENCY", 4))
+GENERATION_MAX_ROUNDS = int(os.getenv("GENERATION_MAX_ROUNDS", 3))
+# Threads that stream generation calls when questions are pushed to the client as they arrive
+generation_stream_executor = ThreadPoolExecutor(max_workers=GENERATION_CONCURRENCY, thread_name_prefix="question-stream")
+
+# Cosine similarity of question stems above which two questions count as duplicates
+DUPLICATE_SIMILARITY = float(os.getenv("DUPLICATE_SIMILARITY", 0.9))
+DEDUPE_MAX_ROUNDS = 2
+
+# How quiz content is chosen from the document: "multi_query" asks the LLM for query
+# variants, "mmr" and "kmeans" sample chunks across the document without an LLM call
+RETRIEVAL_STRATEGIES = ("multi_query",) + COVERAGE_METHODS
+RETRIEVAL_STRATEGY = os.getenv("RETRIEVAL_STRATEGY", "multi_query")
+RETRIEVAL_K = 4
+# Coverage mode returns this many candidate chunks; pack_context trims them to the token budget
+COVERAGE_K = int(os.getenv("COVERAGE_K", 24))
+
+# Prompt content budget: tokens per requested question, clamped to [min, max]
+CONTEXT_TOKENS_PER_QUESTION = int(os.getenv("CONTEXT_TOKENS_PER_QUESTION", 600))
+CONTEXT_MIN_TOKENS = int(os.getenv("CONTEXT_MIN_TOKENS", 1500))
+CONTEXT_MAX_TOKENS = int(os.getenv("CONTEXT_MAX_TOKENS", 12000))
+# Used to estimate tokens when the GPT-2 tokenizer is unavailable
+CHARS_PER_TOKEN = 4
+
+# Persistent FAISS index cache
+INDEX_CACHE_DIR = os.getenv("INDEX_CACHE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "index_cache"))
+INDEX_CACHE_MAX_BYTES = int(os.getenv("INDEX_CACHE_MAX_BYTES", 2 * 1024 ** 3))
+
+# Chunk-level embedding store shared across uploads
+EMBEDDING_STORE_DIR = os.getenv("EMBEDDING_STORE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "embedding_store"))
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", 64))
+
+# LLM response cache: in-memory LRU in front of the llm_cache collection
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "true").lower() == "true"
+LLM_CACHE_SIZE = int(os.getenv("LLM_CACHE_SIZE", 1000))
+
+# Quiz results pagination
+QUIZ_RESULTS_PAGE_SIZE = 50
+QUIZ_RESULTS_MAX_PAGE_SIZE = 500
+
+# Background pool for classroom creation jobs
+CLASSROOM_JOB_WORKERS = int(os.getenv("CLASSROOM_JOB_WORKERS", 4))
+# A queued or running job not updated for this long lost its worker thread (restart, reloader)
+CLASSROOM_JOB_STALE_SECONDS = int(os.getenv("CLASSROOM_JOB_STALE_SECONDS", 15 * 60))
+# Seconds between keep-alive comments on a streamed classroom response
+SSE_KEEPALIVE_SECONDS = 15
+classroom_job_executor = ThreadPoolExecutor(max_workers=CLASSROOM_JOB_WORKERS, thread_name_prefix="classroom-job")
+
 client = Client(api_key=LANGCHAIN_API_KEY)
 tracer = LangChainTracer(project_name=LANGCHAIN_PROJECT)
 load_dotenv()
 
+llm_cache = TieredLLMCache(llm_cache_collection, max_entries=LLM_CACHE_SIZE) if LLM_CACHE_ENABLED else None
+
 try:
     llm = ChatGroq(
         temperature=0.2,
         model_name="meta-llama/llama-4-maverick-17b-128e-instruct",
-        groq_api_key=GROQ_API_KEY
+        groq_api_key=GROQ_API_KEY,
+        cache=llm_cache
     )
     print("ChatGroq initialized successfully")
 except Exception as e:
     print(f"ChatGroq initialization failed: {str(e)}")
 
 try:
-    embeddings = HuggingFaceEmbeddings(
-        model_name="sentence-transformers/all-MiniLM-L6-v2"
+    embeddings = CachedEmbeddings(
+        HuggingFaceEmbeddings(
+            model_name=EMBEDDING_MODEL,
+            encode_kwargs={"batch_size": EMBEDDING_BATCH_SIZE}
+        ),
+        EmbeddingStore(EMBEDDING_STORE_DIR, EMBEDDING_MODEL),
+        batch_size=EMBEDDING_BATCH_SIZE
     )
     print("HuggingFaceEmbeddings initialized successfully")
 except Exception as e:
     print(f"HuggingFaceEmbeddings initialization failed: {str(e)}")
 
 class GraphState(TypedDict):
-    retriever: MultiQueryRetriever
+    retriever: BaseRetriever
     content: str
+    documents: List[str]
     difficulty: str
     num_questions: int
     questions: List[Dict]
+    on_question: Callable
 
-def process_document(file_path, file_type=None):
-    try:
-        print(f"Processing document: {file_path} (type: {file_type})")
-        if file_type == 'pdf':
-            loader = PyPDFLoader(file_path)
-        elif file_type in ['doc', 'docx']:
-            loader = Docx2txtLoader(file_path)
-        else:
-            loader = TextLoader(file_path)
-        documents = loader.load()
-        content = " ".join([doc.page_content for doc in documents])
-        print(f"Extracted content length: {len(content) if content else 0}")
-        if not content:
-            raise ValueError("Failed to extract content from the document")
+_index_cache_lock = threading.Lock()
 
-        text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=2000,
-            chunk_overlap=200
-        )
-        chunks = text_splitter.split_text(content)
-        print(f"Number of chunks: {len(chunks)}")
-        if not chunks:
-            raise ValueError("No text chunks created from document")
+_tokenizer_available = True
+
+def count_tokens(text):
+    """Approximate token count for sizing the prompt budget.
 
-        print("Creating FAISS vector store...")
-        vectorstore = FAISS.from_texts(chunks, embeddings)
-        base_retriever = vectorstore.as_retriever(search_kwargs={"k": 4})
+    ChatGroq does not override get_num_tokens, so LangChain counts with the GPT-2
+    tokenizer from transformers (fetched from the Hugging Face hub on first use), not
+    the Llama model's own. That is only an approximation of what the model sees, which
+    is acceptable for a budget; without transformers, falls back to CHARS_PER_TOKEN.
+    """
+    global _tokenizer_available
+    if _tokenizer_available:
+        try:
+            return llm.get_num_tokens(text)
+        except Exception as e:
+            _tokenizer_available = False
+            print(f"Tokenizer unavailable, estimating {CHARS_PER_TOKEN} characters per token: {str(e)}")
+    return -(-len(text) // CHARS_PER_TOKEN)
+
+def context_token_budget(num_questions):
+    return min(CONTEXT_MAX_TOKENS, max(CONTEXT_MIN_TOKENS, num_questions * CONTEXT_TOKENS_PER_QUESTION))
+
+def index_cache_key(file_path):
+    """SHA-256 of the file bytes plus every parameter that affects the resulting index."""
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    digest.update(f"|{CHUNK_SIZE}|{CHUNK_OVERLAP}|{EMBEDDING_MODEL}".encode("utf-8"))
+    return digest.hexdigest()
+
+def _dir_size(path):
+    return sum(
+        os.path.getsize(os.path.join(root, name))
+        for root, _, files in os.walk(path) for name in files
+    )
+
+def load_cached_index(cache_key):
+    path = os.path.join(INDEX_CACHE_DIR, cache_key)
+    if not os.path.isdir(path):
+        return None
+    try:
+        vectorstore = FAISS.load_local(path, embeddings, allow_dangerous_deserialization=True)
+        os.utime(path)  # mark as recently used for LRU eviction
+        print(f"Index cache hit: {cache_key}")
+        return vectorstore
+    except Exception as e:
+        print(f"Failed to load cached index {cache_key}: {str(e)}")
+        shutil.rmtree(path, ignore_errors=True)
+        return None
+
+def save_cached_index(cache_key, vectorstore):
+    path = os.path.join(INDEX_CACHE_DIR, cache_key)
+    tmp_path = f"{path}.tmp-{os.getpid()}-{threading.get_ident()}"
+    try:
+        os.makedirs(INDEX_CACHE_DIR, exist_ok=True)
+        vectorstore.save_local(tmp_path)
+        with _index_cache_lock:
+            if os.path.isdir(path):
+                shutil.rmtree(tmp_path, ignore_errors=True)
+            else:
+                os.replace(tmp_path, path)
+            evict_index_cache()
+        print(f"Saved index to cache: {cache_key}")
+    except Exception as e:
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        print(f"Failed to cache index {cache_key}: {str(e)}")
+
+def evict_index_cache(max_bytes=None):
+    """Remove least recently used indexes until the cache fits in max_bytes."""
+    max_bytes = INDEX_CACHE_MAX_BYTES if max_bytes is None else max_bytes
+    entries = []
+    for name in os.listdir(INDEX_CACHE_DIR):
+        path = os.path.join(INDEX_CACHE_DIR, name)
+        if os.path.isdir(path) and ".tmp-" not in name:
+            entries.append((os.path.getmtime(path), _dir_size(path), path))
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        shutil.rmtree(path, ignore_errors=True)
+        total -= size
+        print(f"Evicted cached index: {os.path.basename(path)}")
+
+def add_chunks_to_index(vectorstore, chunks):
+    if vectorstore is None:
+        return FAISS.from_texts(chunks, embeddings)
+    vectorstore.add_texts(chunks)
+    return vectorstore
+
+def process_document(file_path, file_type=None, strategy=None):
+    try:
+        print(f"Processing document: {file_path} (type: {file_type})")
+        cache_key = index_cache_key(file_path)
+        vectorstore = load_cached_index(cache_key)
+        if vectorstore is None:
+            if file_type == 'pdf':
+                pages = iter_pdf_pages(file_path)
+            else:
+                if file_type in ['doc', 'docx']:
+                    loader = Docx2txtLoader(file_path)
+                else:
+                    loader = TextLoader(file_path)
+                pages = (doc.page_content for doc in loader.lazy_load())
+
+            text_splitter = RecursiveCharacterTextSplitter(
+                chunk_size=CHUNK_SIZE,
+                chunk_overlap=CHUNK_OVERLAP
+            )
+            # Pages stream into the splitter and chunks into the index in batches,
+            # so the whole document is never held as one string
+            print("Creating FAISS vector store...")
+            chunk_count = 0
+            content_length = 0
+            batch = []
+            for chunk in iter_chunks(pages, text_splitter, window=SPLIT_WINDOW):
+                batch.append(chunk)
+                if len(batch) >= INDEX_BUILD_BATCH:
+                    vectorstore = add_chunks_to_index(vectorstore, batch)
+                    chunk_count += len(batch)
+                    content_length += sum(len(c) for c in batch)
+                    batch = []
+            if batch:
+                vectorstore = add_chunks_to_index(vectorstore, batch)
+                chunk_count += len(batch)
+                content_length += sum(len(c) for c in batch)
+            print(f"Extracted content length (chunked): {content_length}")
+            print(f"Number of chunks: {chunk_count}")
+            if vectorstore is None:
+                raise ValueError("Failed to extract content from the document")
+            save_cached_index(cache_key, vectorstore)
+        strategy = strategy or RETRIEVAL_STRATEGY
+        if strategy in COVERAGE_METHODS:
+            print(f"Creating coverage retriever ({strategy}, k={COVERAGE_K})...")
+            return CoverageRetriever(vectorstore=vectorstore, k=COVERAGE_K, method=strategy)
+        if strategy != "multi_query":
+            raise ValueError(f"Unknown retrieval strategy: {strategy}")
+
+        base_retriever = vectorstore.as_retriever(search_kwargs={"k": RETRIEVAL_K})
 
         print("Creating MultiQueryRetriever...")
         retriever = MultiQueryRetriever.from_llm(
@@ -142,6 +358,19 @@ def process_document(file_path, file_type=None):
         print(f"Error in process_document: {error_details}")
         raise ValueError(f"Failed to process document: {str(e)}")
 
+def pack_context(state: GraphState) -> GraphState:
+    documents = state["documents"]
+    budget = context_token_budget(state["num_questions"])
+    try:
+        # Chunks come from the index, so their vectors are served by the embedding store
+        packed, used = pack_documents(documents, _unit_vectors(documents), budget, count_tokens)
+    except Exception as e:
+        error_details = traceback.format_exc()
+        print(f"Error in pack_context, using retrieved content as is: {error_details}")
+        return {}
+    print(f"Packed {len(packed)} of {len(documents)} chunks into {used}/{budget} tokens")
+    return {"content": "\n\n".join(packed), "documents": packed}
+
 def retrieve_content(state: GraphState) -> GraphState:
     try:
         retriever = state.get("retriever")
@@ -153,7 +382,8 @@ def retrieve_content(state: GraphState) -> GraphState:
 
         query = f"Information for {difficulty} difficulty quiz"
         docs = retriever.invoke(query)
-        content = "\n\n".join([doc.page_content for doc in docs]) if docs else ""
+        documents = [doc.page_content for doc in docs] if docs else []
+        content = "\n\n".join(documents)
         print(f"Retrieved content length: {len(content)}")
         if not content:
             raise ValueError("No relevant content retrieved")
@@ -161,6 +391,7 @@ def retrieve_content(state: GraphState) -> GraphState:
         return {
             "retriever": retriever,
             "content": content,
+            "documents": documents,
             "difficulty": difficulty,
             "num_questions": state["num_questions"]
         }
@@ -169,20 +400,13 @@ def retrieve_content(state: GraphState) -> GraphState:
         print(f"Error in retrieve_content: {error_details}")
         raise ValueError(f"Failed to retrieve content: {str(e)}")
 
-def generate_questions(state: GraphState) -> GraphState:
-    try:
-        content = state["content"]
-        difficulty = state["difficulty"]
-        num_questions = state["num_questions"]
-        print(f"Generating {num_questions} questions (difficulty: {difficulty}, content length: {len(content)})")
-
-        prompt = ChatPromptTemplate.from_template(""" 
+QUESTION_PROMPT = ChatPromptTemplate.from_template(""" 
         You are an expert quiz creator. Create {num_questions} quiz questions with the following parameters:
         
         1. Difficulty level: {difficulty}
         2. Each question should have four possible answers (A, B, C, D)
         4. Only use information found in the provided content
-        
+        {avoid}
         Content:
         {content}
         
@@ -204,25 +428,134 @@ def generate_questions(state: GraphState) -> GraphState:
         Only return the JSON without any additional explanation or text.
         """)
 
-        parser = JsonOutputParser()
-        chain = prompt | llm | parser
-        questions = chain.invoke({
-            "content": content,
-            "difficulty": difficulty,
-            "num_questions": num_questions
-        })
-        print(f"Generated {len(questions) if questions else 0} questions")
-        if not questions or not isinstance(questions, list):
-            raise ValueError("No valid questions generated")
+def validate_question(question):
+    """Return an error message for a malformed question, or None if it is usable."""
+    if not isinstance(question, dict):
+        return "is not an object"
+    if not all(key in question for key in ["question", "options", "correct_answer", "explanation"]):
+        return "is missing required fields"
+    if not isinstance(question["options"], list) or len(question["options"]) != 4:
+        return "does not have exactly 4 options"
+    if question["correct_answer"] not in question["options"]:
+        return "has a correct answer that is not in the options"
+    return None
+
+def _question_key(question):
+    return " ".join(question["question"].lower().split())
+
+def plan_generation_slices(documents, num_questions, per_call=QUESTIONS_PER_CALL):
+    """Split num_questions into calls of at most per_call, each over a different share of the documents."""
+    slice_count = max(1, -(-num_questions // per_call))
+    sizes = [num_questions // slice_count + (1 if i < num_questions % slice_count else 0) for i in range(slice_count)]
+    slices = []
+    for i, size in enumerate(sizes):
+        share = documents[i::slice_count] or [documents[i % len(documents)]]
+        slices.append((size, "\n\n".join(share)))
+    return slices
+
+def request_questions(documents, difficulty, count, existing, label="Generation", on_question=None):
+    """Run one round of concurrent generation calls for count questions.
+
+    Returns the new questions that are valid and not exact duplicates of existing ones;
+    failed calls and bad questions simply come back short. With on_question, the calls
+    are streamed and each accepted question is passed to it as soon as it is complete.
+    A reply that does not parse or holds an invalid question is evicted from the LLM
+    cache, so neither the next round nor a later upload is served the same reply.
+    """
+    avoid = ""
+    if existing:
+        avoid = "5. Do not repeat any of these existing questions: " + "; ".join(q["question"] for q in existing) + "\n"
+    slices = plan_generation_slices(documents, count)
+    inputs = [
+        {"content": slice_content, "difficulty": difficulty, "num_questions": size, "avoid": avoid}
+        for size, slice_content in slices
+    ]
+    print(f"{label}: {count} questions over {len(slices)} concurrent calls")
+
+    seen = {_question_key(q) for q in existing}
+    questions = []
+    accept_lock = threading.Lock()
+
+    def accept(idx, question):
+        """Keep question unless it is a duplicate; returns False if it is malformed."""
+        error = validate_question(question)
+        if error:
+            print(f"Dropping generated question {idx}: {error}")
+            return False
+        key = _question_key(question)
+        with accept_lock:
+            if key in seen:
+                print(f"Dropping duplicate question: {question['question']}")
+                return True
+            seen.add(key)
+            questions.append(question)
+        if on_question is not None:
+            on_question(question)
+        return True
+
+    if on_question is None:
+        chain = QUESTION_PROMPT | llm | JsonOutputParser()
+        results = chain.batch(inputs, config={"max_concurrency": GENERATION_CONCURRENCY}, return_exceptions=True)
+        for (size, _), call_inputs, result in zip(slices, inputs, results):
+            if isinstance(result, Exception) or not isinstance(result, list):
+                print(f"Generation call for {size} questions failed: {result}")
+                evict_reply(llm, QUESTION_PROMPT.format_messages(**call_inputs))
+                continue
+            valid = [accept(idx, question) for idx, question in enumerate(result[:size])]
+            if not all(valid):
+                evict_reply(llm, QUESTION_PROMPT.format_messages(**call_inputs))
+        return questions
+
+    def stream_call(size, call_inputs):
+        messages = QUESTION_PROMPT.format_messages(**call_inputs)
+        parser = ArrayItemParser()
+        received = 0
+        valid = True
+        for text in stream_with_cache(llm, messages):
+            for question in parser.feed(text):
+                if received < size:
+                    valid = accept(received, question) and valid
+                received += 1
+        if not (valid and parser.closed and received and not parser.skipped):
+            print(f"Generation call for {size} questions returned an unusable reply")
+            evict_reply(llm, messages)
+
+    # Each call runs in a copy of this context so fresh_generation() reaches the stream threads
+    futures = [
+        generation_stream_executor.submit(contextvars.copy_context().run, stream_call, size, call_inputs)
+        for (size, _), call_inputs in zip(slices, inputs)
+    ]
+    for (size, _), future in zip(slices, futures):
+        try:
+            future.result()
+        except Exception as e:
+            print(f"Generation call for {size} questions failed: {str(e)}")
+    return questions
+
+def generate_questions(state: GraphState) -> GraphState:
+    try:
+        content = state["content"]
+        documents = state.get("documents") or [content]
+        difficulty = state["difficulty"]
+        num_questions = state["num_questions"]
+        print(f"Generating {num_questions} questions (difficulty: {difficulty}, content length: {len(content)})")
 
-        # Validate each question
-        for idx, question in enumerate(questions):
-            if not all(key in question for key in ["question", "options", "correct_answer", "explanation"]):
-                raise ValueError(f"Question {idx} is missing required fields")
-            if len(question["options"]) != 4:
-                raise ValueError(f"Question {idx} does not have exactly 4 options")
-            if question["correct_answer"] not in question["options"]:
-                raise ValueError(f"Question {idx} has a correct answer that is not in the options")
+        # Failed calls and bad questions become missing slots that the next round refills
+        questions = []
+        for attempt in range(GENERATION_MAX_ROUNDS):
+            missing = num_questions - len(questions)
+            if missing <= 0:
+                break
+            questions += request_questions(
+                documents, difficulty, missing, questions, f"Generation round {attempt + 1}", state.get("on_question")
+            )
+
+        questions = questions[:num_questions]
+        print(f"Generated {len(questions)} questions")
+        if not questions:
+            raise ValueError("No valid questions generated")
+        if len(questions) < num_questions:
+            print(f"Warning: only {len(questions)} of {num_questions} questions could be generated")
 
         return {"questions": questions}
     except Exception as e:
@@ -230,18 +563,128 @@ def generate_questions(state: GraphState) -> GraphState:
         print(f"Error in generate_questions: {error_details}")
         raise Exception(f"Failed to generate questions: {str(e)}")
 
+def _unit_vectors(texts, cached=True):
+    """L2-normalised embeddings; cached=False skips the chunk embedding store, for one-off
+    texts such as question stems that would only grow it."""
+    model = embeddings if cached else embeddings.base
+    vectors = np.asarray(model.embed_documents(texts), dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+def find_near_duplicates(vectors, threshold, reference=None):
+    """Indexes of rows in vectors that are near-duplicates of an earlier row or of any reference row.
+
+    Similarities come from one matrix product; rows are then kept greedily in order.
+    """
+    similarity = vectors @ vectors.T
+    np.fill_diagonal(similarity, -1.0)
+    too_close_to_reference = np.zeros(len(vectors), dtype=bool)
+    if reference is not None and len(reference):
+        too_close_to_reference = (vectors @ reference.T).max(axis=1) >= threshold
+    kept = np.zeros(len(vectors), dtype=bool)
+    duplicates = []
+    for i in range(len(vectors)):
+        if too_close_to_reference[i] or (similarity[i, kept] >= threshold).any():
+            duplicates.append(i)
+        else:
+            kept[i] = True
+    return duplicates
+
+def dedupe_questions(state: GraphState) -> GraphState:
+    try:
+        questions = state["questions"]
+        if len(questions) < 2:
+            return {"questions": questions}
+        documents = state.get("documents") or [state["content"]]
+        difficulty = state["difficulty"]
+
+        vectors = _unit_vectors([q["question"] for q in questions], cached=False)
+        duplicates = set(find_near_duplicates(vectors, DUPLICATE_SIMILARITY))
+        kept = [q for i, q in enumerate(questions) if i not in duplicates]
+        kept_vectors = vectors[[i for i in range(len(questions)) if i not in duplicates]]
+        print(f"Found {len(duplicates)} near-duplicate questions (threshold {DUPLICATE_SIMILARITY})")
+
+        # Ask the LLM only for replacements, and check those against what is kept
+        for attempt in range(DEDUPE_MAX_ROUNDS):
+            missing = len(questions) - len(kept)
+            if missing <= 0:
+                break
+            replacements = request_questions(documents, difficulty, missing, kept, f"Replacement round {attempt + 1}")
+            if not replacements:
+                continue
+            replacement_vectors = _unit_vectors([q["question"] for q in replacements], cached=False)
+            rejected = set(find_near_duplicates(replacement_vectors, DUPLICATE_SIMILARITY, kept_vectors))
+            accepted = [i for i in range(len(replacements)) if i not in rejected][:missing]
+            kept += [replacements[i] for i in accepted]
+            kept_vectors = np.vstack([kept_vectors, replacement_vectors[accepted]])
+
+        if len(kept) < len(questions):
+            print(f"Warning: {len(questions) - len(kept)} near-duplicate questions could not be replaced")
+        return {"questions": kept}
+    except Exception as e:
+        # Deduplication is an optimisation; keep the generated quiz if it fails
+        error_details = traceback.format_exc()
+        print(f"Error in dedupe_questions: {error_details}")
+        return {"questions": state["questions"]}
+
 def create_quiz_graph():
     workflow = StateGraph(GraphState)
     workflow.add_node("retrieve_content", retrieve_content)
+    workflow.add_node("pack_context", pack_context)
     workflow.add_node("generate_questions", generate_questions)
-    workflow.add_edge("retrieve_content", "generate_questions")
-    workflow.add_edge("generate_questions", END)
+    workflow.add_node("dedupe_questions", dedupe_questions)
+    workflow.add_edge("retrieve_content", "pack_context")
+    workflow.add_edge("pack_context", "generate_questions")
+    workflow.add_edge("generate_questions", "dedupe_questions")
+    workflow.add_edge("dedupe_questions", END)
     workflow.set_entry_point("retrieve_content")
     return workflow.compile()
 
 # Add this import at the top of your file
+def encode_results_cursor(result):
+    """Opaque keyset cursor for the (timestamp, _id) position of a result row."""
+    timestamp = result.get("timestamp")
+    position = {"t": timestamp.isoformat() if isinstance(timestamp, datetime) else None, "id": str(result["_id"])}
+    return base64.urlsafe_b64encode(json.dumps(position).encode("utf-8")).decode("ascii")
+
+def decode_results_cursor(cursor):
+    position = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+    timestamp = datetime.fromisoformat(position["t"]) if position["t"] else None
+    return timestamp, ObjectId(position["id"])
+
+def quiz_results_query(subject, cursor=None):
+    """Filter for results after cursor in (timestamp desc, _id desc) order.
+
+    Attempts evaluated before timestamps were recorded have none and sort last.
+    """
+    query = {"subject": subject}
+    if cursor:
+        timestamp, last_id = decode_results_cursor(cursor)
+        if timestamp is None:
+            query.update({"timestamp": None, "_id": {"$lt": last_id}})
+        else:
+            query["$or"] = [
+                {"timestamp": {"$lt": timestamp}},
+                {"timestamp": timestamp, "_id": {"$lt": last_id}},
+                {"timestamp": None}
+            ]
+    return query
+
+def format_quiz_result(result):
+    return {
+        "email": result.get("email", "Unknown"),
+        "marks": result.get("score", 0),
+        "totalMarks": result.get("total_questions", 0),
+        "timestamp": result.get("timestamp", "N/A")  # Include timestamp to distinguish attempts
+    }
+
 @app.route('/api/quiz-results', methods=['GET'])
 def get_quiz_results():
+    """One page of results for a subject, newest first.
+
+    Query parameters: subject, limit (default 50), cursor (next_cursor of the previous page),
+    format=ndjson to stream every remaining row as newline-delimited JSON instead.
+    """
     try:
         print("Fetching quiz results...")
         subject = request.args.get('subject')
@@ -251,40 +694,138 @@ def get_quiz_results():
             print(f"Missing parameters: subject={subject}")
             return jsonify({"error": "Subject is required"}), 400
 
-        # Query user_response_collection for all records matching the subject
+        cursor = request.args.get('cursor')
+        try:
+            limit = int(request.args.get('limit', QUIZ_RESULTS_PAGE_SIZE))
+            query = quiz_results_query(subject, cursor)
+        except (ValueError, KeyError, TypeError, InvalidId) as e:
+            print(f"Invalid pagination parameters: {str(e)}")
+            return jsonify({"error": "Invalid limit or cursor"}), 400
+        if limit < 1 or limit > QUIZ_RESULTS_MAX_PAGE_SIZE:
+            return jsonify({"error": f"limit must be between 1 and {QUIZ_RESULTS_MAX_PAGE_SIZE}"}), 400
+
         results = user_response_collection.find(
-            {"subject": subject},
-            {"email": 1, "score": 1, "total_questions": 1, "timestamp": 1, "_id": 0}  # Include timestamp for clarity
-        )
+            query,
+            {"email": 1, "score": 1, "total_questions": 1, "timestamp": 1}
+        ).sort([("timestamp", -1), ("_id", -1)])
 
-        # Convert cursor to list and format results
-        formatted_results = [
-            {
-                "email": result.get("email", "Unknown"),
-                "marks": result.get("score", 0),
-                "totalMarks": result.get("total_questions", 0),
-                "timestamp": result.get("timestamp", "N/A")  # Include timestamp to distinguish attempts
-            }
-            for result in results
-        ]
+        if request.args.get('format') == 'ndjson':
+            def stream_rows():
+                for result in results.batch_size(QUIZ_RESULTS_PAGE_SIZE):
+                    yield json.dumps(format_quiz_result(result), default=str) + "\n"
+            return Response(stream_rows(), mimetype="application/x-ndjson")
+
+        page = list(results.limit(limit + 1))
+        next_cursor = encode_results_cursor(page[limit - 1]) if len(page) > limit else None
+        formatted_results = [format_quiz_result(result) for result in page[:limit]]
 
         # Check if results exist
-        if not formatted_results:
+        if not formatted_results and not cursor:
             print(f"No results found for subject: {subject}")
             return jsonify({"error": "No results found for this subject"}), 404
 
-        # Log the number of results found
-        print(f"Found {len(formatted_results)} results for subject: {subject}")
-        for result in formatted_results:
-            print(f"Result: {result}")
-
-        return jsonify(formatted_results), 200
+        print(f"Returning {len(formatted_results)} results for subject: {subject} (more: {next_cursor is not None})")
+        return jsonify({"results": formatted_results, "next_cursor": next_cursor}), 200
 
     except Exception as e:
         error_details = traceback.format_exc()
         print(f"Error in get_quiz_results: {error_details}")
         return jsonify({"error": str(e), "details": error_details}), 500
-    
+
+@app.route('/api/quiz-results/summary', methods=['GET'])
+def get_quiz_results_summary():
+    """Count, mean, percentiles and a histogram of percentage scores for a subject."""
+    try:
+        subject = request.args.get('subject')
+        if not subject:
+            return jsonify({"error": "Subject is required"}), 400
+        try:
+            bins = int(request.args.get('bins', 10))
+        except ValueError:
+            return jsonify({"error": "bins must be an integer"}), 400
+        if bins < 1 or bins > 100:
+            return jsonify({"error": "bins must be between 1 and 100"}), 400
+
+        # Percentages are grouped by whole point on the server, so at most 101 rows come back
+        # however many attempts there are; percentiles are exact to one percentage point
+        facets = list(user_response_collection.aggregate([
+            {"$match": {"subject": subject, "percentage": {"$ne": None}}},
+            {"$facet": {
+                "stats": [{"$group": {
+                    "_id": None,
+                    "count": {"$sum": 1},
+                    "mean_score": {"$avg": "$score"},
+                    "mean_percentage": {"$avg": "$percentage"},
+                    "min_percentage": {"$min": "$percentage"},
+                    "max_percentage": {"$max": "$percentage"},
+                    "stddev_percentage": {"$stdDevPop": "$percentage"}
+                }}],
+                "points": [
+                    {"$group": {"_id": {"$floor": "$percentage"}, "count": {"$sum": 1}}},
+                    {"$sort": {"_id": 1}}
+                ]
+            }}
+        ]))[0]
+
+        if not facets["stats"]:
+            print(f"No results found for subject: {subject}")
+            return jsonify({"error": "No results found for this subject"}), 404
+        stats = facets["stats"][0]
+        stats.pop("_id")
+        points = [(min(max(int(p["_id"]), 0), 100), p["count"]) for p in facets["points"]]
+
+        def percentile(q):
+            rank = q / 100 * stats["count"]
+            seen = 0
+            for point, count in points:
+                seen += count
+                if seen >= rank:
+                    return point
+            return points[-1][0]
+
+        width = 100 / bins
+        histogram = [{"from": round(i * width, 2), "to": round((i + 1) * width, 2), "count": 0} for i in range(bins)]
+        for point, count in points:
+            histogram[min(int(point // width), bins - 1)]["count"] += count
+
+        stats.update({f"p{q}_percentage": percentile(q) for q in (25, 50, 75, 90)})
+        return jsonify({"subject": subject, **stats, "histogram": histogram}), 200
+    except Exception as e:
+        error_details = traceback.format_exc()
+        print(f"Error in get_quiz_results_summary: {error_details}")
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/quiz-analytics', methods=['GET'])
+def get_quiz_analytics():
+    """Materialised analytics for a subject or a form (one document read)."""
+    try:
+        subject = request.args.get('subject')
+        form_id = request.args.get('form_id')
+        if bool(subject) == bool(form_id):
+            return jsonify({"error": "Provide exactly one of subject or form_id"}), 400
+
+        doc = quiz_analytics_collection.find_one({"_id": subject_key(subject) if subject else form_key(form_id)})
+        if not doc or not doc.get("count"):
+            return jsonify({"error": "No analytics found"}), 404
+        return jsonify(summarize(doc)), 200
+    except Exception as e:
+        error_details = traceback.format_exc()
+        print(f"Error in get_quiz_analytics: {error_details}")
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/question-stats/<form_id>', methods=['GET'])
+def get_question_stats(form_id):
+    """p-value, discrimination and distractor frequencies for each question of a form."""
+    try:
+        doc = question_stats_collection.find_one({"_id": form_id})
+        if not doc or not doc.get("responses"):
+            return jsonify({"error": "No question statistics found for this form"}), 404
+        return jsonify(item_statistics(doc)), 200
+    except Exception as e:
+        error_details = traceback.format_exc()
+        print(f"Error in get_question_stats: {error_details}")
+        return jsonify({"error": str(e)}), 500
+
 from datetime import datetime
 def is_valid_email(email):
     import re
@@ -435,64 +976,58 @@ def get_classrooms(teacher):
         print(f"Error in get_classrooms: {error_details}")
         return jsonify({"error": str(e)}), 500
     
-@app.route('/api/classrooms', methods=['POST'])
-def create_classroom():
-    print("Received request to create classroom")
-    if 'document' not in request.files:
-        print("Validation failed: No document provided")
-        return jsonify({"error": "No document provided"}), 400
-
-    file = request.files['document']
-    name = request.form.get('name')
-    subject = request.form.get('subject')
-    description = request.form.get('description', '')
-    student_emails = request.form.get('studentEmails')
-    teacher = request.form.get('teacher')
-    difficulty = request.form.get('difficulty', 'medium')
-    num_questions = request.form.get('numQuestions', 5)
-
-    if not name or not student_emails or not teacher:
-        print("Validation failed: Required fields missing")
-        return jsonify({"error": "Required fields missing"}), 400
-
-    if difficulty not in ['easy', 'medium', 'hard']:
-        print(f"Validation failed: Invalid difficulty: {difficulty}")
-        return jsonify({"error": "Invalid difficulty level"}), 400
-
-    try:
-        num_questions = int(num_questions)
-        if num_questions < 1 or num_questions > 20:
-            print(f"Validation failed: Invalid number of questions: {num_questions}")
-            return jsonify({"error": "Number of questions must be between 1 and 20"}), 400
-    except ValueError:
-        print(f"Validation failed: Invalid number of questions: {num_questions}")
-        return jsonify({"error": "Number of questions must be a valid integer"}), 400
-
-    file_extension = file.filename.rsplit('.', 1)[1].lower() if '.' in file.filename else ''
-    if file_extension not in ['pdf', 'doc', 'docx']:
-        print(f"Validation failed: Invalid file type: {file_extension}")
-        return jsonify({"error": "Only PDF, DOC, DOCX files allowed"}), 400
+CLASSROOM_JOB_STAGES = [
+    ("queued", 0),
+    ("processing_document", 5),
+    ("generating_questions", 25),
+    ("saving_quiz", 60),
+    ("creating_form", 70),
+    ("adding_form_questions", 80),
+    ("saving_form_metadata", 90),
+    ("saving_classroom", 95),
+    ("completed", 100),
+]
+CLASSROOM_JOB_PROGRESS = dict(CLASSROOM_JOB_STAGES)
 
-    filename = secure_filename(file.filename)
-    file_path = os.path.join(app.config['UPLOAD_FOLDER'], filename)
+def update_classroom_job(job_id, **fields):
+    fields["updatedDate"] = datetime.now()
+    if "stage" in fields and "progress" not in fields:
+        fields["progress"] = CLASSROOM_JOB_PROGRESS.get(fields["stage"], 0)
     try:
-        file.save(file_path)
-        print(f"Saved document to: {file_path}")
+        classroom_jobs_collection.update_one({"_id": job_id}, {"$set": fields})
     except Exception as e:
-        error_details = traceback.format_exc()
-        print(f"Failed to save file: {error_details}")
-        return jsonify({"error": f"Failed to save file: {str(e)}"}), 500
-
+        print(f"Failed to update classroom job {job_id}: {str(e)}")
+
+def build_classroom(params, job_id=None, emit=None):
+    """Run every classroom creation stage; returns the response payload or raises.
+
+    emit(event, data), if given, receives each stage and each generated question as it happens.
+    """
+    def stage(name):
+        print(f"Classroom job {job_id or '(inline)'}: {name}")
+        if job_id is not None:
+            update_classroom_job(job_id, status="running", stage=name)
+        if emit is not None:
+            emit("stage", {"stage": name, "progress": CLASSROOM_JOB_PROGRESS.get(name, 0)})
+
+    name = params["name"]
+    subject = params["subject"]
+    file_path = params["file_path"]
     try:
         # Step 1: Generate quiz using the document
         print("Generating quiz...")
-        retriever = process_document(file_path, file_extension)
-        quiz_graph = create_quiz_graph()
-        result = quiz_graph.invoke({
-            "retriever": retriever,
-            "difficulty": difficulty,
-            "num_questions": num_questions
-        })
+        # fresh=true skips cached LLM responses (the new ones replace them)
+        with fresh_generation(params.get("fresh", False)):
+            stage("processing_document")
+            retriever = process_document(file_path, params["file_extension"], params.get("retrieval_strategy"))
+            stage("generating_questions")
+            quiz_graph = create_quiz_graph()
+            result = quiz_graph.invoke({
+                "retriever": retriever,
+                "difficulty": params["difficulty"],
+                "num_questions": params["num_questions"],
+                "on_question": (lambda question: emit("question", question)) if emit is not None else None
+            })
 
         if not result.get("questions") or not isinstance(result["questions"], list):
             print("Quiz generation failed: No valid questions generated")
@@ -500,8 +1035,12 @@ def create_classroom():
 
         generated_questions = result["questions"]
         print(f"Generated {len(generated_questions)} questions: {json.dumps(generated_questions, indent=2)}")
+        if emit is not None:
+            # Deduplication may have replaced streamed questions; this is the final set
+            emit("questions", generated_questions)
 
         # Step 2: Save the generated quiz to MongoDB (quiz_collection)
+        stage("saving_quiz")
         quiz_data = {
             "title": f"Quiz for {name}",
             "questions": generated_questions,
@@ -516,12 +1055,14 @@ def create_classroom():
 
         # Step 3: Create a Google Form using the generated questions
         print("Creating Google Form...")
+        stage("creating_form")
         form_metadata = {"info": {"title": f"Quiz for {name}"}}
         form = service.forms().create(body=form_metadata).execute()
         form_id = form["formId"]
         print(f"Google Form created with ID: {form_id}")
 
         # Step 4: Add the generated questions to the Google Form
+        stage("adding_form_questions")
         requests = []
         for idx, question in enumerate(generated_questions):
             question_text = question["question"]
@@ -558,6 +1099,7 @@ def create_classroom():
         print(f"Google Form link: {form_link}")
 
         # Step 5: Update the quiz in MongoDB with the Google Form link
+        stage("saving_form_metadata")
         quiz_collection.update_one(
             {"_id": quiz_id},
             {"$set": {"googleFormLink": form_link}}
@@ -586,15 +1128,16 @@ def create_classroom():
         print(f"Saved Google Form metadata for quiz {quiz_id} in form_responses_collection")
 
         # Step 7: Save the classroom to MongoDB
+        stage("saving_classroom")
         students = [
-            {"email": email.strip()} for email in student_emails.split('\n') if email.strip()
+            {"email": email.strip()} for email in params["student_emails"].split('\n') if email.strip()
         ]
         classroom_data = {
             "name": name,
             "subject": subject,
-            "description": description,
+            "description": params["description"],
             "document": file_path,
-            "teacher": teacher,
+            "teacher": params["teacher"],
             "students": students,
             "quizzes": [quiz_id],
             "createdDate": datetime.now(),
@@ -603,31 +1146,215 @@ def create_classroom():
         classroom_result = classroom_collection.insert_one(classroom_data)
         print(f"Classroom created with ID: {classroom_result.inserted_id}")
 
-        return jsonify({
+        return {
             "message": "Classroom and quiz created successfully",
             "classroom_id": str(classroom_result.inserted_id),
             "quiz_id": str(quiz_id),
             "google_form_link": form_link
-        }), 201
+        }
 
-    except Exception as e:
-        error_details = traceback.format_exc()
-        print(f"Error in create_classroom: {error_details}")
+    except Exception:
         if 'quiz_id' in locals():
             quiz_collection.delete_one({"_id": quiz_id})
             print(f"Rolled back: Deleted quiz with ID: {quiz_id}")
             form_responses_collection.delete_one({"quiz_id": str(quiz_id)})
             print(f"Rolled back: Deleted form responses for quiz ID: {quiz_id}")
-        return jsonify({"error": str(e)}), 500
+        raise
 
     finally:
         try:
             if os.path.exists(file_path):
-                os.remove(file_path)
+                shutil.rmtree(params["upload_dir"], ignore_errors=True)
                 print(f"Temporary file removed: {file_path}")
         except Exception as e:
             print(f"Failed to remove temporary file {file_path}: {str(e)}")
 
+def run_classroom_job(job_id, params, emit=None):
+    try:
+        result = build_classroom(params, job_id, emit)
+        update_classroom_job(job_id, status="succeeded", stage="completed", result=result)
+        print(f"Classroom job {job_id} completed")
+        if emit is not None:
+            emit("done", result)
+    except Exception as e:
+        error_details = traceback.format_exc()
+        print(f"Error in classroom job {job_id}: {error_details}")
+        update_classroom_job(job_id, status="failed", error=str(e))
+        if emit is not None:
+            emit("error", {"error": str(e)})
+
+def stream_classroom_job(job_id, params):
+    """Run the job in the background and relay its events as server-sent events."""
+    events = queue.Queue()
+    classroom_job_executor.submit(run_classroom_job, job_id, params, lambda event, data: events.put((event, data)))
+
+    def event_stream():
+        yield sse_event("job", {"job_id": str(job_id), "status_url": f"/api/classrooms/jobs/{job_id}"})
+        while True:
+            try:
+                event, data = events.get(timeout=SSE_KEEPALIVE_SECONDS)
+            except queue.Empty:
+                yield ": keep-alive\n\n"
+                continue
+            yield sse_event(event, data)
+            if event in ("done", "error"):
+                return
+
+    # The job keeps running if the client disconnects; its status stays available by polling
+    return Response(event_stream(), mimetype="text/event-stream", headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@app.route('/api/classrooms', methods=['POST'])
+def create_classroom():
+    print("Received request to create classroom")
+    if 'document' not in request.files:
+        print("Validation failed: No document provided")
+        return jsonify({"error": "No document provided"}), 400
+
+    file = request.files['document']
+    name = request.form.get('name')
+    subject = request.form.get('subject')
+    description = request.form.get('description', '')
+    student_emails = request.form.get('studentEmails')
+    teacher = request.form.get('teacher')
+    difficulty = request.form.get('difficulty', 'medium')
+    num_questions = request.form.get('numQuestions', 5)
+    # wait=true keeps the old blocking behaviour for callers that need it
+    wait = (request.args.get('wait') or request.form.get('wait', '')).lower() == 'true'
+    fresh = (request.args.get('fresh') or request.form.get('fresh', '')).lower() == 'true'
+    # stream=true answers with server-sent events: stages, each question as it is generated, then the result
+    stream = (request.args.get('stream') or request.form.get('stream', '')).lower() == 'true'
+    retrieval_strategy = request.form.get('retrievalStrategy', RETRIEVAL_STRATEGY)
+
+    if not name or not student_emails or not teacher:
+        print("Validation failed: Required fields missing")
+        return jsonify({"error": "Required fields missing"}), 400
+
+    if difficulty not in ['easy', 'medium', 'hard']:
+        print(f"Validation failed: Invalid difficulty: {difficulty}")
+        return jsonify({"error": "Invalid difficulty level"}), 400
+
+    if retrieval_strategy not in RETRIEVAL_STRATEGIES:
+        print(f"Validation failed: Invalid retrieval strategy: {retrieval_strategy}")
+        return jsonify({"error": f"retrievalStrategy must be one of: {', '.join(RETRIEVAL_STRATEGIES)}"}), 400
+
+    try:
+        num_questions = int(num_questions)
+        if num_questions < 1 or num_questions > 20:
+            print(f"Validation failed: Invalid number of questions: {num_questions}")
+            return jsonify({"error": "Number of questions must be between 1 and 20"}), 400
+    except ValueError:
+        print(f"Validation failed: Invalid number of questions: {num_questions}")
+        return jsonify({"error": "Number of questions must be a valid integer"}), 400
+
+    file_extension = file.filename.rsplit('.', 1)[1].lower() if '.' in file.filename else ''
+    if file_extension not in ['pdf', 'doc', 'docx']:
+        print(f"Validation failed: Invalid file type: {file_extension}")
+        return jsonify({"error": "Only PDF, DOC, DOCX files allowed"}), 400
+
+    # Each upload gets its own directory so concurrent jobs with the same file name don't collide
+    upload_dir = tempfile.mkdtemp(dir=app.config['UPLOAD_FOLDER'])
+    file_path = os.path.join(upload_dir, secure_filename(file.filename))
+    try:
+        file.save(file_path)
+        print(f"Saved document to: {file_path}")
+    except Exception as e:
+        error_details = traceback.format_exc()
+        print(f"Failed to save file: {error_details}")
+        shutil.rmtree(upload_dir, ignore_errors=True)
+        return jsonify({"error": f"Failed to save file: {str(e)}"}), 500
+
+    params = {
+        "name": name,
+        "subject": subject,
+        "description": description,
+        "student_emails": student_emails,
+        "teacher": teacher,
+        "difficulty": difficulty,
+        "num_questions": num_questions,
+        "file_path": file_path,
+        "file_extension": file_extension,
+        "upload_dir": upload_dir,
+        "fresh": fresh,
+        "retrieval_strategy": retrieval_strategy
+    }
+
+    if wait:
+        try:
+            return jsonify(build_classroom(params)), 201
+        except Exception as e:
+            error_details = traceback.format_exc()
+            print(f"Error in create_classroom: {error_details}")
+            return jsonify({"error": str(e)}), 500
+
+    try:
+        job_id = classroom_jobs_collection.insert_one({
+            "type": "create_classroom",
+            "status": "queued",
+            "stage": "queued",
+            "progress": 0,
+            "teacher": teacher,
+            "name": name,
+            "subject": subject,
+            "createdDate": datetime.now(),
+            "updatedDate": datetime.now()
+        }).inserted_id
+    except Exception as e:
+        error_details = traceback.format_exc()
+        print(f"Failed to create classroom job: {error_details}")
+        shutil.rmtree(upload_dir, ignore_errors=True)
+        return jsonify({"error": f"Failed to create classroom job: {str(e)}"}), 500
+
+    if stream:
+        print(f"Streaming classroom job {job_id}")
+        return stream_classroom_job(job_id, params)
+
+    classroom_job_executor.submit(run_classroom_job, job_id, params)
+    print(f"Queued classroom job {job_id}")
+    return jsonify({
+        "message": "Classroom creation started",
+        "job_id": str(job_id),
+        "status": "queued",
+        "status_url": f"/api/classrooms/jobs/{job_id}"
+    }), 202
+
+@app.route('/api/classrooms/jobs/<job_id>', methods=['GET'])
+def get_classroom_job(job_id):
+    try:
+        try:
+            job = classroom_jobs_collection.find_one({"_id": ObjectId(job_id)})
+        except Exception as e:
+            print(f"Invalid job_id format: {str(e)}")
+            return jsonify({"error": "Invalid job_id format"}), 400
+
+        if not job:
+            return jsonify({"error": "Job not found"}), 404
+
+        # Jobs run on an in-process pool, so one left behind by a restart never finishes
+        updated = job.get("updatedDate")
+        if job.get("status") in ("queued", "running") and updated and \
+                datetime.now() - updated > timedelta(seconds=CLASSROOM_JOB_STALE_SECONDS):
+            error = "Classroom job was interrupted (no progress since the server restarted)"
+            classroom_jobs_collection.update_one(
+                {"_id": job["_id"], "status": job["status"], "updatedDate": updated},
+                {"$set": {"status": "failed", "error": error, "updatedDate": datetime.now()}}
+            )
+            job.update(status="failed", error=error)
+
+        return jsonify({
+            "job_id": str(job["_id"]),
+            "status": job.get("status"),
+            "stage": job.get("stage"),
+            "progress": job.get("progress", 0),
+            "result": job.get("result"),
+            "error": job.get("error"),
+            "createdDate": job["createdDate"].isoformat() if job.get("createdDate") else None,
+            "updatedDate": job["updatedDate"].isoformat() if job.get("updatedDate") else None
+        }), 200
+    except Exception as e:
+        error_details = traceback.format_exc()
+        print(f"Error in get_classroom_job: {error_details}")
+        return jsonify({"error": str(e)}), 500
+
 @app.route('/api/student/login', methods=['POST'])
 def student_login():
     try:
@@ -637,32 +1364,7 @@ def student_login():
             print("Validation failed: Email is required")
             return jsonify({"error": "Email is required"}), 400
 
-        classrooms = classroom_collection.find({"students.email": email})
-        classrooms_list = []
-        for c in classrooms:
-            quizzes = []
-            for q in c.get("quizzes", []):
-                try:
-                    quiz_id = ObjectId(q) if isinstance(q, str) else q
-                    quiz = quiz_collection.find_one({"_id": quiz_id})
-                    if quiz:
-                        quizzes.append({
-                            "_id": str(quiz["_id"]),
-                            "title": quiz.get("title", ""),
-                            "googleFormLink": quiz.get("googleFormLink", ""),
-                            "name": quiz.get("name", ""),
-                            "subject": quiz.get("subject", "")
-                        })
-                except Exception as e:
-                    print(f"Invalid quiz ID: {q}, error: {str(e)}")
-                    continue
-
-            classrooms_list.append({
-                "_id": str(c["_id"]),
-                "name": c.get("name", ""),
-                "subject": c.get("subject", ""),
-                "quizzes": quizzes
-            })
+        classrooms_list = student_classrooms(classroom_collection, quiz_collection, email)
 
         if not classrooms_list:
             print(f"No classrooms found for email: {email}")
@@ -857,19 +1559,57 @@ def evaluate_quiz():
             "total_questions": total_questions,
             "question_results": question_results,
             "evaluated_at": datetime.now().isoformat(),
+            "timestamp": datetime.now(),
             "name": data.get("name", "Unknown"),
             "email": data.get("studentEmail", "Unknown"),
             "subject": data.get("subject", "General Knowledge"),
             "guizid": data.get("quiz_id", str(form_response.get("quiz_id", ""))),
         }
 
-        # Update user response in MongoDB
+        # Save the evaluation only if the response is unchanged since it was read, clearing the
+        # version markers; a concurrent evaluation of the same response then fails this filter
+        # instead of retracting the same earlier evaluation a second time.
         print("Updating user response in MongoDB...")
-        update_result = user_response_collection.update_one(
-            {"_id": user_response["_id"]},
-            {"$set": evaluation_result}
+        saved = user_response_collection.find_one_and_update(
+            {"_id": user_response["_id"], "evaluated_at": user_response.get("evaluated_at")},
+            {"$set": evaluation_result, "$unset": {"analytics_version": "", "question_stats_version": ""}}
         )
-        print(f"Update result: Matched {update_result.matched_count}, Modified {update_result.modified_count}")
+        if saved is None:
+            print(f"Response {user_response['_id']} was re-evaluated concurrently, leaving analytics to that evaluation")
+            return jsonify(evaluation_result)
+
+        # The earlier evaluation is retracted only if it carries the marker; evaluations saved
+        # before the analytics existed, or whose update failed, were never counted.
+        markers = {}
+        previous = saved if saved.get("analytics_version") == ANALYTICS_VERSION else None
+        try:
+            record_evaluation(quiz_analytics_collection, evaluation_result, previous)
+            markers["analytics_version"] = ANALYTICS_VERSION
+        except Exception as e:
+            print(f"Failed to update quiz analytics, run quiz_analytics.py --rebuild: {str(e)}")
+        previous = saved if saved.get("question_stats_version") == QUESTION_STATS_VERSION else None
+        try:
+            record_response(question_stats_collection, form_id, quiz_questions, evaluation_result, previous)
+            markers["question_stats_version"] = QUESTION_STATS_VERSION
+        except Exception as e:
+            print(f"Failed to update question stats, run question_stats.py to rebuild: {str(e)}")
+
+        if markers:
+            stamped = user_response_collection.update_one(
+                {"_id": user_response["_id"], "evaluated_at": evaluation_result["evaluated_at"]},
+                {"$set": markers}
+            )
+            # Re-evaluated again before the markers landed, so that evaluation did not retract this one
+            if not stamped.matched_count and "analytics_version" in markers:
+                try:
+                    retract_evaluation(quiz_analytics_collection, evaluation_result)
+                except Exception as e:
+                    print(f"Failed to retract superseded analytics, run quiz_analytics.py --rebuild: {str(e)}")
+            if not stamped.matched_count and "question_stats_version" in markers:
+                try:
+                    retract_response(question_stats_collection, form_id, quiz_questions, evaluation_result)
+                except Exception as e:
+                    print(f"Failed to retract superseded question stats, run question_stats.py to rebuild: {str(e)}")
 
         print("Returning evaluation result")
         return jsonify(evaluation_result)
@@ -947,7 +1687,3 @@ def get_latest_form_id():
 def health_check():
     print("Health check requested")
     return jsonify({"status": "healthy"}), 200
-
-if __name__ == "__main__":
-    print("Starting Flask server...")
-    app.run(debug=True, host='0.0.0.0', port=int(os.environ.get('PORT', 5000)))
@@ -0,0 +1,53 @@
+"""Read paths for the student-facing classroom endpoints.
+
+Kept separate from app.py so student_login_bench.py can exercise exactly the
+queries the route runs without loading the quiz generator.
+"""
+from bson.objectid import ObjectId
+
+CLASSROOM_FIELDS = {"name": 1, "subject": 1, "quizzes": 1}
+QUIZ_FIELDS = {"title": 1, "googleFormLink": 1, "name": 1, "subject": 1}
+
+def _as_object_id(quiz_id):
+    try:
+        return ObjectId(quiz_id) if isinstance(quiz_id, str) else quiz_id
+    except Exception as e:
+        print(f"Invalid quiz ID: {quiz_id}, error: {str(e)}")
+        return None
+
+def student_classrooms(classroom_collection, quiz_collection, email):
+    """Classrooms a student belongs to, each with its quizzes, in two queries.
+
+    Quiz ids from every classroom are fetched with one $in query; missing or malformed
+    ids are skipped and each classroom keeps its own quiz order.
+    """
+    classrooms = list(classroom_collection.find({"students.email": email}, CLASSROOM_FIELDS))
+    classroom_quiz_ids = [
+        [quiz_id for quiz_id in map(_as_object_id, c.get("quizzes", [])) if quiz_id is not None]
+        for c in classrooms
+    ]
+    quiz_ids = {quiz_id for ids in classroom_quiz_ids for quiz_id in ids}
+    quizzes = {}
+    if quiz_ids:
+        quizzes = {quiz["_id"]: quiz for quiz in quiz_collection.find({"_id": {"$in": list(quiz_ids)}}, QUIZ_FIELDS)}
+
+    classrooms_list = []
+    for c, ids in zip(classrooms, classroom_quiz_ids):
+        classroom_quizzes = []
+        for quiz_id in ids:
+            quiz = quizzes.get(quiz_id)
+            if quiz:
+                classroom_quizzes.append({
+                    "_id": str(quiz["_id"]),
+                    "title": quiz.get("title", ""),
+                    "googleFormLink": quiz.get("googleFormLink", ""),
+                    "name": quiz.get("name", ""),
+                    "subject": quiz.get("subject", "")
+                })
+        classrooms_list.append({
+            "_id": str(c["_id"]),
+            "name": c.get("name", ""),
+            "subject": c.get("subject", ""),
+            "quizzes": classroom_quizzes
+        })
+    return classrooms_list
@@ -0,0 +1,130 @@
+"""Index declarations for the eduquiz database used by app.py.
+
+INDEXES lists every index the routes rely on; ensure_indexes() creates them
+and is safe to run on every start, since create_index is a no-op for an index
+that already exists with the same keys and name. ROUTE_QUERIES mirrors the
+filters and sorts the routes issue, and check_query_plans() runs explain() on
+each one and reports any that would still scan the whole collection.
+
+Run as a migration / CI check against a database:
+    python db_indexes.py                # ensure indexes
+    python db_indexes.py --check        # ensure, then fail on any COLLSCAN
+"""
+import argparse
+import os
+import sys
+
+from bson.objectid import ObjectId
+from pymongo import MongoClient, errors
+
+# collection -> [(keys, options)]
+INDEXES = {
+    "classrooms": [
+        # student_login (multikey over the students array)
+        ([("students.email", 1)], {"name": "students_email"}),
+        # get_classrooms
+        ([("teacher", 1)], {"name": "teacher"}),
+    ],
+    "quizzes": [
+        # create_google_form without a quiz_id falls back to the latest quiz
+        ([("createdDate", -1)], {"name": "created_desc"}),
+    ],
+    "form_responses": [
+        # evaluate_quiz
+        ([("form_id", 1)], {"name": "form_id"}),
+        # create_classroom rollback
+        ([("quiz_id", 1)], {"name": "quiz_id"}),
+        # get_latest_form_id
+        ([("createdDate", -1)], {"name": "created_desc"}),
+    ],
+    "user_response": [
+        # evaluate_quiz: the latest response for a form, optionally a specific response_id
+        ([("form_id", 1), ("response_id", 1), ("createdDate", -1)], {"name": "form_response_created"}),
+        ([("form_id", 1), ("createdDate", -1)], {"name": "form_created"}),
+        # quiz-results keyset pagination and summary
+        ([("subject", 1), ("timestamp", -1), ("_id", -1)], {"name": "subject_timestamp_id"}),
+    ],
+    "teacher": [
+        # signup and login
+        ([("email", 1)], {"name": "email"}),
+    ],
+}
+
+# (collection, filter, sort, route) with representative values, as issued by app.py
+ROUTE_QUERIES = [
+    ("classrooms", {"students.email": "student@example.com"}, None, "student_login"),
+    ("classrooms", {"teacher": "Teacher"}, None, "get_classrooms"),
+    ("quizzes", {"_id": {"$in": [ObjectId(), ObjectId()]}}, None, "student_login"),
+    ("quizzes", {}, [("createdDate", -1)], "create_google_form"),
+    ("form_responses", {"form_id": "form"}, None, "evaluate_quiz"),
+    ("form_responses", {"quiz_id": "quiz"}, None, "create_classroom"),
+    ("form_responses", {}, [("createdDate", -1)], "get_latest_form_id"),
+    ("user_response", {"form_id": "form", "response_id": "response"}, [("createdDate", -1)], "evaluate_quiz"),
+    ("user_response", {"form_id": "form"}, [("createdDate", -1)], "evaluate_quiz"),
+    ("user_response", {"subject": "Subject"}, [("timestamp", -1), ("_id", -1)], "get_quiz_results"),
+    ("teacher", {"email": "teacher@example.com"}, None, "signup"),
+    ("teacher", {"email": "teacher@example.com", "name": "Teacher"}, None, "login"),
+]
+
+def ensure_indexes(db):
+    """Create any missing index; returns the names of indexes that could not be created."""
+    failed = []
+    for collection_name, indexes in INDEXES.items():
+        for keys, options in indexes:
+            try:
+                db[collection_name].create_index(keys, **options)
+            except errors.ConnectionFailure as e:
+                # No point waiting out the server selection timeout once per index
+                print(f"Skipping index creation, MongoDB is unreachable: {str(e)}")
+                return [f"{name}.{o['name']}" for name, specs in INDEXES.items() for _, o in specs]
+            except Exception as e:
+                failed.append(f"{collection_name}.{options['name']}")
+                print(f"Failed to create index {collection_name}.{options['name']}: {str(e)}")
+    print(f"Ensured {sum(len(i) for i in INDEXES.values()) - len(failed)} MongoDB indexes")
+    return failed
+
+def _plan_stages(plan):
+    """Every stage name in an explain() plan tree (classic and slot-based engine layouts)."""
+    if isinstance(plan, dict):
+        if "stage" in plan:
+            yield plan["stage"]
+        for value in plan.values():
+            yield from _plan_stages(value)
+    elif isinstance(plan, list):
+        for value in plan:
+            yield from _plan_stages(value)
+
+def check_query_plans(db, queries=ROUTE_QUERIES):
+    """Return (route, collection, filter) for every route query whose winning plan is a COLLSCAN."""
+    scans = []
+    for collection_name, query, sort, route in queries:
+        cursor = db[collection_name].find(query)
+        if sort:
+            cursor = cursor.sort(sort)
+        explanation = cursor.explain()
+        if "COLLSCAN" in _plan_stages(explanation["queryPlanner"]["winningPlan"]):
+            scans.append((route, collection_name, query))
+    return scans
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Ensure eduquiz MongoDB indexes")
+    parser.add_argument("--uri", default=os.getenv("MONGODB_URI", "mongodb://localhost:27017/"))
+    parser.add_argument("--database", default="eduquiz")
+    parser.add_argument("--check", action="store_true", help="Fail if any route query plan is a COLLSCAN")
+    args = parser.parse_args(argv)
+
+    db = MongoClient(args.uri)[args.database]
+    failed = ensure_indexes(db)
+    if failed:
+        return 1
+    if args.check:
+        scans = check_query_plans(db)
+        for route, collection_name, query in scans:
+            print(f"COLLSCAN: {route} on {collection_name} with {query}")
+        if scans:
+            return 1
+        print(f"All {len(ROUTE_QUERIES)} route queries use an index")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
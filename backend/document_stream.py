@@ -0,0 +1,79 @@
+"""Streaming document extraction for the quiz generator.
+
+PDF pages are extracted in parallel by a process pool and yielded in page
+order with a bounded number of page ranges in flight, and text is split into
+chunks incrementally, so a 500-page textbook is never held in memory as one
+string. The pool is created from classroom-job threads in a process that
+already runs torch, pymongo monitors and several thread pools, so it always
+uses the "spawn" start method: forking a multi-threaded process can deadlock
+the child on a lock held by another thread. This module is kept free of
+app.py's imports so spawned workers start cheaply. Spawn also re-imports the
+main script in each worker, which is why the server starts through server.py.
+"""
+import multiprocessing
+import os
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import PyPDF2
+
+EXTRACTION_WORKERS = int(os.getenv("EXTRACTION_WORKERS", os.cpu_count() or 1))
+PAGES_PER_TASK = 8
+# Below this many pages the pool's startup cost outweighs the speedup
+PARALLEL_MIN_PAGES = 24
+
+_executor = None
+_executor_lock = threading.Lock()
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(max_workers=EXTRACTION_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+        return _executor
+
+def extract_pdf_pages(file_path, start, end):
+    """Text of pages [start, end) of the PDF; runs inside a pool worker."""
+    reader = PyPDF2.PdfReader(file_path)
+    return [reader.pages[i].extract_text() or "" for i in range(start, end)]
+
+def pdf_page_count(file_path):
+    return len(PyPDF2.PdfReader(file_path).pages)
+
+def iter_pdf_pages(file_path, workers=None, pages_per_task=PAGES_PER_TASK):
+    """Yield page texts in order, extracting page ranges in parallel."""
+    workers = workers or EXTRACTION_WORKERS
+    page_count = pdf_page_count(file_path)
+    if workers <= 1 or page_count < PARALLEL_MIN_PAGES:
+        yield from extract_pdf_pages(file_path, 0, page_count)
+        return
+
+    executor = _get_executor()
+    ranges = deque((start, min(start + pages_per_task, page_count)) for start in range(0, page_count, pages_per_task))
+    in_flight = deque()
+    # Keep two tasks per worker queued so workers stay busy while memory stays bounded
+    while ranges or in_flight:
+        while ranges and len(in_flight) < workers * 2:
+            start, end = ranges.popleft()
+            in_flight.append(executor.submit(extract_pdf_pages, file_path, start, end))
+        yield from in_flight.popleft().result()
+
+def iter_chunks(pages, splitter, window):
+    """Split a stream of page texts into chunks, holding at most ~window characters at a time.
+
+    Pages are joined with a space, as the loader output was before. The last chunk of
+    each split is carried into the next window so chunk boundaries do not depend on
+    page boundaries.
+    """
+    buffer = ""
+    for page in pages:
+        if not page:
+            continue
+        buffer = f"{buffer} {page}" if buffer else page
+        if len(buffer) >= window:
+            chunks = splitter.split_text(buffer)
+            yield from chunks[:-1]
+            buffer = chunks[-1] if chunks else ""
+    if buffer:
+        yield from splitter.split_text(buffer)
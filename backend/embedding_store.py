@@ -0,0 +1,177 @@
+"""Chunk-level embedding cache for the quiz generator.
+
+EmbeddingStore keeps one float32 vector per chunk hash in an append-only,
+memory-mapped matrix on disk. CachedEmbeddings wraps any LangChain embeddings
+model so only chunks that have never been seen are sent to the model, in
+batches of an explicit size.
+"""
+import hashlib
+import json
+import os
+import threading
+from contextlib import contextmanager
+from typing import List
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process lock, so use one process per store
+    fcntl = None
+
+def chunk_hash(text, model_name):
+    return hashlib.sha256(f"{model_name}\0{text}".encode("utf-8")).hexdigest()
+
+class EmbeddingStore:
+    """Append-only hash -> float32 vector store backed by a memory-mapped file.
+
+    Layout inside `path`:
+        meta.json    {"model": ..., "dim": ...}
+        keys.txt     one chunk hash per line; line number == row
+        vectors.f32  row-major float32 matrix, rows x dim
+        lock         flock'd around every read of new rows and every append
+
+    Several processes (gunicorn workers) can share a store. Each keeps the rows
+    it has seen and, under the lock, reads the keys other processes appended
+    since, so new rows are always numbered from what is on disk.
+    """
+
+    def __init__(self, path, model_name):
+        self.path = path
+        self.model_name = model_name
+        self.dim = None
+        self._rows = {}
+        self._keys_size = 0
+        self._matrix = None
+        self._lock = threading.Lock()
+        os.makedirs(path, exist_ok=True)
+        self._meta_path = os.path.join(path, "meta.json")
+        self._keys_path = os.path.join(path, "keys.txt")
+        self._vectors_path = os.path.join(path, "vectors.f32")
+        self._lock_path = os.path.join(path, "lock")
+        with self._locked():
+            self._refresh()
+
+    @contextmanager
+    def _locked(self):
+        with self._lock:
+            if fcntl is None:
+                yield
+                return
+            with open(self._lock_path, "a") as f:
+                fcntl.flock(f, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _refresh(self):
+        """Pick up rows appended since the last look. Call with the store locked."""
+        if self.dim is None:
+            if not os.path.exists(self._meta_path):
+                return
+            with open(self._meta_path) as f:
+                meta = json.load(f)
+            if meta.get("model") != self.model_name:
+                raise ValueError(f"Embedding store at {self.path} was built with {meta.get('model')}, not {self.model_name}")
+            self.dim = meta["dim"]
+        data = b""
+        if os.path.exists(self._keys_path):
+            with open(self._keys_path, "rb") as f:
+                f.seek(self._keys_size)
+                data = f.read()
+        # A line without its newline is a key cut off mid-write
+        lines = data.split(b"\n")[:-1]
+        row_bytes = 4 * self.dim
+        vector_rows = os.path.getsize(self._vectors_path) // row_bytes if os.path.exists(self._vectors_path) else 0
+        lines = lines[:max(0, vector_rows - len(self._rows))]
+        # Every writer holds the lock, so anything past the complete rows is left over from a
+        # crashed append: cut both files back so the next append stays aligned
+        self._keys_size += sum(len(line) + 1 for line in lines)
+        with open(self._keys_path, "ab") as f:
+            f.truncate(self._keys_size)
+        with open(self._vectors_path, "ab") as f:
+            f.truncate((len(self._rows) + len(lines)) * row_bytes)
+        if lines:
+            for line in lines:
+                self._rows[line.decode("utf-8")] = len(self._rows)
+            self._remap()
+
+    def _remap(self):
+        rows = len(self._rows)
+        self._matrix = np.memmap(self._vectors_path, dtype=np.float32, mode="r", shape=(rows, self.dim)) if rows else None
+
+    def __len__(self):
+        return len(self._rows)
+
+    def get_many(self, keys):
+        """Return {key: vector} for the keys present in the store."""
+        with self._lock:
+            missing = any(key not in self._rows for key in keys)
+            known_size = self._keys_size
+        if missing and os.path.exists(self._keys_path) and os.path.getsize(self._keys_path) != known_size:
+            with self._locked():
+                self._refresh()
+        with self._lock:
+            found = {key: self._rows[key] for key in keys if key in self._rows}
+            matrix = self._matrix
+        return {key: np.array(matrix[row]) for key, row in found.items()}
+
+    def put_many(self, keys, vectors):
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if vectors.ndim != 2 or len(keys) != len(vectors):
+            raise ValueError("Expected one vector per key")
+        with self._locked():
+            self._refresh()
+            if self.dim is None:
+                self.dim = int(vectors.shape[1])
+                with open(self._meta_path, "w") as f:
+                    json.dump({"model": self.model_name, "dim": self.dim}, f)
+            new = {}
+            for key, vector in zip(keys, vectors):
+                if key not in self._rows and key not in new:
+                    new[key] = vector
+            if not new:
+                return
+            with open(self._vectors_path, "ab") as f:
+                f.write(np.stack(list(new.values())).tobytes())
+            with open(self._keys_path, "ab") as f:
+                f.write("".join(f"{key}\n" for key in new).encode("utf-8"))
+                self._keys_size = f.tell()
+            for key in new:
+                self._rows[key] = len(self._rows)
+            self._remap()
+
+class CachedEmbeddings(Embeddings):
+    """Embeddings wrapper that serves repeated chunks from an EmbeddingStore."""
+
+    def __init__(self, base, store, batch_size=64):
+        self.base = base
+        self.store = store
+        self.batch_size = batch_size
+        self.hits = 0
+        self.misses = 0
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        keys = [chunk_hash(text, self.store.model_name) for text in texts]
+        cached = self.store.get_many(set(keys))
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in cached and key not in missing:
+                missing[key] = text
+        self.hits += len(texts) - len(missing)
+        self.misses += len(missing)
+
+        missing_keys = list(missing)
+        for start in range(0, len(missing_keys), self.batch_size):
+            batch_keys = missing_keys[start:start + self.batch_size]
+            vectors = self.base.embed_documents([missing[key] for key in batch_keys])
+            self.store.put_many(batch_keys, vectors)
+            cached.update(zip(batch_keys, np.asarray(vectors, dtype=np.float32)))
+
+        print(f"Embedded {len(missing)} new chunks, {len(texts) - len(missing)} served from the embedding store")
+        return [cached[key].tolist() for key in keys]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.base.embed_query(text)
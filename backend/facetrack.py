@@ -1,20 +1,38 @@
 from flask import Flask, request, jsonify
 from flask_cors import CORS
+from flask_sock import Sock
+from simple_websocket import ConnectionClosed
 import cv2
 import numpy as np
 import base64
+import json
 import time
-import winsound
+import threading
+import uuid
+import os
+from collections import deque
+from concurrent.futures import Future, TimeoutError as FrameTimeout
+import queue
+import requests
 from math import hypot
+from datetime import datetime, timezone
+from pymongo import MongoClient
 import logging
 import sys
 
+try:
+    import winsound
+except ImportError:
+    # Only available on Windows; the sound sink is skipped elsewhere
+    winsound = None
+
 # Set up logging
 logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger(__name__)
 
 app = Flask(__name__)
 CORS(app, resources={r"/*": {"origins": "*"}})
+sock = Sock(app)
 
 # Test basic imports and environment
 logger.info("Starting Flask application")
@@ -32,169 +50,882 @@ logger.info("Haar Cascade models loaded successfully")
 
 # Global variables
 ALERT_ENABLED = True
-looking_away = False
-looking_away_start_time = 0
 alert_threshold = 1.5
-last_alert_time = 0
 alert_cooldown = 5.0
-warnings = 0
 max_warnings = 3
-long_blink_count = 0
 
-def play_alert():
-    global ALERT_ENABLED
-    if ALERT_ENABLED:
+# Session registry settings
+DEFAULT_SESSION_ID = "default"
+SESSION_IDLE_TIMEOUT = 30 * 60
+SESSION_EVICTION_INTERVAL = 60.0
+
+# Frame engine settings
+FRAME_WORKERS = int(os.getenv("FRAME_WORKERS", os.cpu_count() or 1))
+FRAME_QUEUE_SIZE = int(os.getenv("FRAME_QUEUE_SIZE", 512))
+FRAME_BATCH_SIZE = int(os.getenv("FRAME_BATCH_SIZE", 8))
+FRAME_TIMEOUT = float(os.getenv("FRAME_TIMEOUT", 5.0))
+
+# Face tracking settings: full detection every N frames, padded ROI search in between
+TRACKING_ENABLED = os.getenv("TRACKING_ENABLED", "true").lower() == "true"
+DETECT_EVERY_N_FRAMES = int(os.getenv("DETECT_EVERY_N_FRAMES", 5))
+TRACK_ROI_PADDING = 0.5
+TRACK_FACE_SIZE = 80
+TRACK_SCALE_FACTOR = 1.1
+
+# Width of the grayscale image the full-frame face cascade runs on (0 = native resolution)
+DETECTION_WIDTH = int(os.getenv("DETECTION_WIDTH", 640))
+LATENCY_WINDOW = 1000
+
+# Pupil locator used by detect_gaze: "contour" or "projection"
+GAZE_METHOD = os.getenv("GAZE_METHOD", "contour")
+
+# Alert dispatch settings
+ALERT_QUEUE_SIZE = int(os.getenv("ALERT_QUEUE_SIZE", 1000))
+ALERT_HISTORY_SIZE = int(os.getenv("ALERT_HISTORY_SIZE", 500))
+ALERT_WEBHOOK_URL = os.getenv("ALERT_WEBHOOK_URL")
+ALERT_WEBHOOK_TIMEOUT = 2.0
+
+# Proctoring event log settings
+PROCTOR_EVENTS_ENABLED = os.getenv("PROCTOR_EVENTS_ENABLED", "true").lower() == "true"
+EVENT_BUFFER_SIZE = int(os.getenv("EVENT_BUFFER_SIZE", 10000))
+EVENT_BATCH_SIZE = int(os.getenv("EVENT_BATCH_SIZE", 500))
+EVENT_FLUSH_INTERVAL = float(os.getenv("EVENT_FLUSH_INTERVAL", 1.0))
+EVENT_MAX_BACKOFF = 30.0
+
+# Proctor fields whose changes are recorded as events
+EVENT_FIELDS = (
+    "face_detected", "looking_at_screen", "look_direction", "eyes_closed",
+    "warnings", "violation_detected", "long_blink_count"
+)
+
+# Content types accepted as a raw encoded frame body on /process-frame
+BINARY_FRAME_MIMETYPES = ('image/jpeg', 'image/png', 'image/webp', 'application/octet-stream')
+
+class ProctorSession:
+    """Proctoring state for a single exam session."""
+    __slots__ = (
+        "session_id", "lock", "looking_away", "looking_away_start_time",
+        "last_alert_time", "warnings", "long_blink_count", "last_seen",
+        "last_box", "face_confidence", "frames_since_detect", "last_event_state"
+    )
+
+    def __init__(self, session_id):
+        self.session_id = session_id
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.looking_away = False
+        self.looking_away_start_time = 0
+        self.last_alert_time = 0
+        self.warnings = 0
+        self.long_blink_count = 0
+        self.last_seen = time.time()
+        self.last_box = None
+        self.face_confidence = 0
+        self.frames_since_detect = 0
+        self.last_event_state = None
+
+    def touch(self, now=None):
+        self.last_seen = now if now is not None else time.time()
+
+class LatencyStats:
+    """Rolling per-frame latency samples, grouped by detection setting."""
+
+    def __init__(self, window=LATENCY_WINDOW):
+        self.window = window
+        self._samples = {}
+        self._lock = threading.Lock()
+
+    def record(self, key, seconds):
+        with self._lock:
+            samples = self._samples.get(key)
+            if samples is None:
+                samples = self._samples[key] = deque(maxlen=self.window)
+            samples.append(seconds)
+
+    def summary(self):
+        with self._lock:
+            snapshot = {key: np.array(samples) * 1000 for key, samples in self._samples.items()}
+        return {
+            key: {
+                "count": int(samples.size),
+                "mean_ms": round(float(samples.mean()), 2),
+                "p50_ms": round(float(np.percentile(samples, 50)), 2),
+                "p95_ms": round(float(np.percentile(samples, 95)), 2)
+            }
+            for key, samples in snapshot.items() if samples.size
+        }
+
+class SessionRegistry:
+    """Thread-safe map of exam session ID -> ProctorSession with idle eviction."""
+
+    def __init__(self, idle_timeout=SESSION_IDLE_TIMEOUT, eviction_interval=SESSION_EVICTION_INTERVAL):
+        self.idle_timeout = idle_timeout
+        self.eviction_interval = eviction_interval
+        self._sessions = {}
+        self._lock = threading.Lock()
+        self._last_eviction = time.time()
+
+    def get(self, session_id, create=True):
+        now = time.time()
+        self._maybe_evict(now)
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is None and create:
+                session = ProctorSession(session_id)
+                self._sessions[session_id] = session
+        if session is not None:
+            session.touch(now)
+        return session
+
+    def start(self, session_id):
+        session = self.get(session_id)
+        with session.lock:
+            session.reset()
+        event_log.record_lifecycle(session, "exam_started")
+        return session
+
+    def end(self, session_id):
+        with self._lock:
+            session = self._sessions.pop(session_id, None)
+        if session is not None:
+            event_log.record_lifecycle(session, "exam_ended")
+        return session
+
+    def evict_idle(self, now=None):
+        now = now if now is not None else time.time()
+        with self._lock:
+            expired = [sid for sid, s in self._sessions.items() if now - s.last_seen > self.idle_timeout]
+            for sid in expired:
+                event_log.record_lifecycle(self._sessions.pop(sid), "session_evicted", now)
+            self._last_eviction = now
+        if expired:
+            logger.info(f"Evicted {len(expired)} idle exam sessions")
+        return expired
+
+    def _maybe_evict(self, now):
+        if now - self._last_eviction > self.eviction_interval:
+            self.evict_idle(now)
+
+    def __len__(self):
+        with self._lock:
+            return len(self._sessions)
+
+sessions = SessionRegistry()
+latency_stats = LatencyStats()
+
+class LogAlertSink:
+    def handle(self, alert):
+        logger.warning(f"ALERT: Not looking at camera! (session: {alert['session_id']}, warnings: {alert['warnings']})")
+
+class SoundAlertSink:
+    """Local beep for single-machine setups; a no-op where winsound is unavailable."""
+
+    def handle(self, alert):
+        if ALERT_ENABLED and winsound is not None:
+            try:
+                winsound.Beep(1000, 300)
+                logger.info("Alert sound played")
+            except Exception as e:
+                logger.error(f"Failed to play alert: {e}")
+
+class WebhookAlertSink:
+    """POSTs each alert as JSON; without a URL it only records what would have been sent."""
+
+    def __init__(self, url=None, timeout=ALERT_WEBHOOK_TIMEOUT):
+        self.url = url
+        self.timeout = timeout
+        self.sent = 0
+
+    def handle(self, alert):
+        if self.url:
+            requests.post(self.url, json=alert, timeout=self.timeout)
+        else:
+            logger.debug(f"Webhook stand-in: {alert}")
+        self.sent += 1
+
+class SubscriberAlertSink:
+    """Keeps recent alerts in memory and fans them out to registered callbacks."""
+
+    def __init__(self, history_size=ALERT_HISTORY_SIZE):
+        self._history = deque(maxlen=history_size)
+        self._subscribers = []
+        self._lock = threading.Lock()
+
+    def subscribe(self, callback):
+        with self._lock:
+            self._subscribers.append(callback)
+
+    def unsubscribe(self, callback):
+        with self._lock:
+            if callback in self._subscribers:
+                self._subscribers.remove(callback)
+
+    def recent(self, session_id=None, since=0):
+        with self._lock:
+            return [
+                alert for alert in self._history
+                if alert["time"] > since and (session_id is None or alert["session_id"] == session_id)
+            ]
+
+    def handle(self, alert):
+        with self._lock:
+            self._history.append(alert)
+            subscribers = list(self._subscribers)
+        for callback in subscribers:
+            try:
+                callback(alert)
+            except Exception as e:
+                logger.error(f"Alert subscriber failed: {e}")
+
+class AlertDispatcher:
+    """Delivers alerts to sinks on a background thread so the frame path never blocks."""
+
+    def __init__(self, sinks, max_queue=ALERT_QUEUE_SIZE):
+        self.sinks = list(sinks)
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._thread = None
+        self.dropped = 0
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="alert-dispatcher", daemon=True)
+            self._thread.start()
+
+    def emit(self, alert):
+        try:
+            self._queue.put_nowait(alert)
+        except queue.Full:
+            self.dropped += 1
+
+    def _run(self):
+        while True:
+            alert = self._queue.get()
+            for sink in self.sinks:
+                try:
+                    sink.handle(alert)
+                except Exception as e:
+                    logger.error(f"Alert sink {type(sink).__name__} failed: {e}")
+
+alert_subscribers = SubscriberAlertSink()
+alert_dispatcher = AlertDispatcher([
+    LogAlertSink(),
+    SoundAlertSink(),
+    WebhookAlertSink(ALERT_WEBHOOK_URL),
+    alert_subscribers
+])
+alert_dispatcher.start()
+
+class ProctorEventLog:
+    """Append-only per-session stream of proctor state transitions, flushed to Mongo in batches.
+
+    record() only appends to a bounded in-memory buffer; a background thread writes
+    batches with insert_many. If Mongo is slow or down, the oldest buffered events
+    are dropped once the buffer is full, so memory stays bounded.
+    """
+
+    def __init__(self, collection, enabled=PROCTOR_EVENTS_ENABLED, buffer_size=EVENT_BUFFER_SIZE,
+                 batch_size=EVENT_BATCH_SIZE, flush_interval=EVENT_FLUSH_INTERVAL):
+        self.collection = collection
+        self.enabled = enabled and collection is not None
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._buffer = deque(maxlen=buffer_size)
+        self._retry = None
+        self._cond = threading.Condition()
+        self._thread = None
+        self.written = 0
+        self.dropped = 0
+
+    def start(self):
+        if self.enabled and self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="proctor-event-log", daemon=True)
+            self._thread.start()
+
+    def _append(self, event):
+        if not self.enabled:
+            return
+        with self._cond:
+            if len(self._buffer) == self._buffer.maxlen:
+                self.dropped += 1
+            self._buffer.append(event)
+            if len(self._buffer) >= self.batch_size:
+                self._cond.notify()
+
+    def record(self, session, proctor_data, current_time):
+        """Append an event if any EVENT_FIELDS changed since the session's last event. Call with session.lock held."""
+        state = {field: proctor_data.get(field) for field in EVENT_FIELDS}
+        previous = session.last_event_state
+        if previous == state:
+            return
+        session.last_event_state = state
+        changes = state if previous is None else {k: v for k, v in state.items() if previous.get(k) != v}
+        self._append({
+            "session_id": session.session_id,
+            "event": "transition",
+            "timestamp": datetime.fromtimestamp(current_time, timezone.utc),
+            "changes": changes,
+            "state": state
+        })
+
+    def record_lifecycle(self, session, event, current_time=None):
+        self._append({
+            "session_id": session.session_id,
+            "event": event,
+            "timestamp": datetime.fromtimestamp(current_time if current_time is not None else time.time(), timezone.utc),
+            "state": {"warnings": session.warnings, "long_blink_count": session.long_blink_count}
+        })
+
+    def pending(self):
+        with self._cond:
+            return len(self._buffer) + (len(self._retry) if self._retry else 0)
+
+    def _next_batch(self):
+        with self._cond:
+            if self._retry is not None:
+                batch, self._retry = self._retry, None
+                return batch
+            if len(self._buffer) < self.batch_size:
+                self._cond.wait(self.flush_interval)
+            return [self._buffer.popleft() for _ in range(min(self.batch_size, len(self._buffer)))]
+
+    def _run(self):
         try:
-            winsound.Beep(1000, 300)
-            logger.info("Alert sound played")
+            self.collection.create_index([("session_id", 1), ("timestamp", 1)])
         except Exception as e:
-            logger.error(f"Failed to play alert: {e}")
-    logger.warning("ALERT: Not looking at camera!")
+            logger.error(f"Failed to create proctor event index: {e}")
+        backoff = self.flush_interval
+        while True:
+            batch = self._next_batch()
+            if not batch:
+                continue
+            try:
+                self.collection.insert_many(batch, ordered=False)
+                self.written += len(batch)
+                backoff = self.flush_interval
+            except Exception as e:
+                logger.error(f"Failed to write {len(batch)} proctor events: {e}")
+                with self._cond:
+                    self._retry = batch
+                time.sleep(backoff)
+                backoff = min(backoff * 2, EVENT_MAX_BACKOFF)
+
+MONGO_URI = os.getenv("MONGODB_URI", "mongodb://localhost:27017/")
+try:
+    mongo_client = MongoClient(MONGO_URI)
+    proctor_events_collection = mongo_client["eduquiz"]["proctor_events"]
+    logger.info("MongoDB client configured for proctor events")
+except Exception as e:
+    logger.error(f"MongoDB connection failed: {e}")
+    proctor_events_collection = None
+
+event_log = ProctorEventLog(proctor_events_collection)
+event_log.start()
+
+def play_alert(session, current_time=None):
+    alert_dispatcher.emit({
+        "type": "looking_away",
+        "session_id": session.session_id,
+        "warnings": session.warnings,
+        "max_warnings": max_warnings,
+        "time": current_time if current_time is not None else time.time()
+    })
+
+PUPIL_THRESHOLD = 55
+
+def _pupil_x_contour(eye_frame):
+    """Centroid x of the largest dark contour after a morphological open (original method)."""
+    _, threshold_eye = cv2.threshold(eye_frame, PUPIL_THRESHOLD, 255, cv2.THRESH_BINARY_INV)
+    kernel = np.ones((3, 3), np.uint8)
+    threshold_eye = cv2.morphologyEx(threshold_eye, cv2.MORPH_OPEN, kernel, iterations=1)
+    contours, _ = cv2.findContours(threshold_eye, cv2.RETR_TREE, cv2.CHAIN_APPROX_SIMPLE)
+    if len(contours) > 0:
+        contour = max(contours, key=cv2.contourArea)
+        if cv2.contourArea(contour) > 10:
+            M = cv2.moments(contour)
+            if M["m00"] != 0:
+                return int(M["m10"] / M["m00"])
+    return None
+
+def _dark_column_counts(eye_frame):
+    """Number of pupil-dark pixels in each column of the eye crop."""
+    return np.count_nonzero(eye_frame <= PUPIL_THRESHOLD, axis=0)
 
-def detect_gaze(eye_frame):
+def _pupil_x_projection(eye_frame):
+    """Column with the most dark pixels (integral projection minimum of brightness)."""
+    columns = _dark_column_counts(eye_frame)
+    if columns.sum() <= 10:
+        return None
+    # Smoothing over neighbouring columns stands in for the morphological open:
+    # isolated dark specks cannot outweigh the pupil
+    columns = np.convolve(columns, np.ones(3, np.int64), mode="same")
+    return float(np.argmax(columns))
+
+PUPIL_LOCATORS = {
+    "contour": _pupil_x_contour,
+    "projection": _pupil_x_projection,
+}
+
+def detect_gaze(eye_frame, method=None):
     try:
         height, width = eye_frame.shape[:2]
-        _, threshold_eye = cv2.threshold(eye_frame, 55, 255, cv2.THRESH_BINARY_INV)
-        kernel = np.ones((3, 3), np.uint8)
-        threshold_eye = cv2.morphologyEx(threshold_eye, cv2.MORPH_OPEN, kernel, iterations=1)
-        contours, _ = cv2.findContours(threshold_eye, cv2.RETR_TREE, cv2.CHAIN_APPROX_SIMPLE)
-        if len(contours) > 0:
-            contour = max(contours, key=cv2.contourArea)
-            if cv2.contourArea(contour) > 10:
-                M = cv2.moments(contour)
-                if M["m00"] != 0:
-                    pupil_cx = int(M["m10"] / M["m00"])
-                    pupil_cy = int(M["m01"] / M["m00"])
-                    relative_x = pupil_cx / width
-                    if 0.3 <= relative_x <= 0.7:
-                        return "center", relative_x
-                    elif relative_x < 0.3:
-                        return "left", relative_x
-                    else:
-                        return "right", relative_x
+        pupil_cx = PUPIL_LOCATORS[method or GAZE_METHOD](eye_frame)
+        if pupil_cx is not None:
+            relative_x = pupil_cx / width
+            if 0.3 <= relative_x <= 0.7:
+                return "center", relative_x
+            elif relative_x < 0.3:
+                return "left", relative_x
+            else:
+                return "right", relative_x
         return "center", 0.5
     except Exception as e:
         logger.error(f"Error in detect_gaze: {e}")
         return "center", 0.5
 
-def process_image(image_data):
-    global looking_away, looking_away_start_time, last_alert_time, warnings, long_blink_count
-    try:
-        img_bytes = base64.b64decode(image_data.split(',')[1])
-        np_arr = np.frombuffer(img_bytes, np.uint8)
-        frame = cv2.imdecode(np_arr, cv2.IMREAD_COLOR)
-        if frame is None:
-            raise ValueError("Failed to decode image")
-        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-        faces = face_cascade.detectMultiScale(gray, 1.3, 5)
-        current_time = time.time()
-
-        face_detected = len(faces) > 0
-        looking_at_screen = False
-        look_direction = "Unknown"
-        eyes_closed = False
-        blink_duration = 0
-        violation_detected = False
-
-        if not face_detected:
-            if not looking_away:
-                looking_away = True
-                looking_away_start_time = current_time
-            elif current_time - looking_away_start_time > alert_threshold:
-                if current_time - last_alert_time > alert_cooldown:
-                    play_alert()
-                    last_alert_time = current_time
-                    warnings += 1
-                violation_detected = warnings >= max_warnings
-        else:
-            looking_away = False
-            for (x, y, w, h) in faces:
-                roi_gray = gray[y:y + h, x:x + w]
-                eyes = eye_cascade.detectMultiScale(roi_gray, 1.1, 5)
-                if len(eyes) == 0:
-                    eyes_closed = True
-                    blink_duration = current_time - (looking_away_start_time if looking_away else current_time)
-                    if blink_duration > 2:
-                        long_blink_count += 1
-                else:
-                    for (ex, ey, ew, eh) in eyes:
-                        eye_frame = roi_gray[ey:ey + eh, ex:ex + ew]
-                        direction, _ = detect_gaze(eye_frame)
-                        look_direction = direction
-                        looking_at_screen = direction == "center"
-                        break
-                if not looking_at_screen:
-                    if not looking_away:
-                        looking_away = True
-                        looking_away_start_time = current_time
-                    elif current_time - looking_away_start_time > alert_threshold:
-                        if current_time - last_alert_time > alert_cooldown:
-                            play_alert()
-                            last_alert_time = current_time
-                            warnings += 1
-                        violation_detected = warnings >= max_warnings
-
-        proctor_data = {
-            "face_detected": face_detected,
-            "looking_at_screen": looking_at_screen,
-            "warnings": warnings,
-            "max_warnings": max_warnings,
-            "violation_detected": violation_detected,
-            "look_direction": look_direction,
-            "eyes_closed": eyes_closed,
-            "blink_duration": blink_duration,
-            "long_blink_count": long_blink_count,
-            "head_pose": [0, 0, 0],
-            "ear": 0
-        }
-        logger.debug(f"Proctor data: {proctor_data}")
-        return proctor_data
-    except Exception as e:
-        logger.error(f"Error processing image: {e}")
-        return {
-            "face_detected": False,
-            "looking_at_screen": False,
-            "warnings": warnings,
-            "max_warnings": max_warnings,
-            "violation_detected": False,
-            "look_direction": "Unknown",
-            "eyes_closed": False,
-            "blink_duration": 0,
-            "long_blink_count": long_blink_count,
-            "head_pose": [0, 0, 0],
-            "ear": 0,
-            "error": str(e)
-        }
+def _register_look_away(session, current_time):
+    if not session.looking_away:
+        session.looking_away = True
+        session.looking_away_start_time = current_time
+        return False
+    if current_time - session.looking_away_start_time > alert_threshold:
+        if current_time - session.last_alert_time > alert_cooldown:
+            session.last_alert_time = current_time
+            session.warnings += 1
+            play_alert(session, current_time)
+        return session.warnings >= max_warnings
+    return False
+
+def _best_face(faces, neighbours):
+    best = int(np.argmax(neighbours))
+    return tuple(int(v) for v in faces[best]), int(neighbours[best])
+
+def _track_face(gray, last_box):
+    """Search a padded, downscaled ROI around last_box. Returns (box, confidence) or (None, 0)."""
+    x, y, w, h = last_box
+    pad = int(max(w, h) * TRACK_ROI_PADDING)
+    x0, y0 = max(0, x - pad), max(0, y - pad)
+    x1, y1 = min(gray.shape[1], x + w + pad), min(gray.shape[0], y + h + pad)
+    roi = gray[y0:y1, x0:x1]
+    scale = min(1.0, TRACK_FACE_SIZE / w)
+    if scale < 1.0:
+        roi = cv2.resize(roi, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+    size = w * scale
+    faces, neighbours = face_cascade.detectMultiScale2(
+        roi, TRACK_SCALE_FACTOR, 5,
+        minSize=(int(size * 0.7), int(size * 0.7)),
+        maxSize=(int(size * 1.4) + 1, int(size * 1.4) + 1)
+    )
+    if len(faces) == 0:
+        return None, 0
+    (fx, fy, fw, fh), confidence = _best_face(faces, neighbours)
+    box = (x0 + int(fx / scale), y0 + int(fy / scale), int(fw / scale), int(fh / scale))
+    return box, confidence
+
+def _detection_image(gray):
+    """Downscale gray to DETECTION_WIDTH; returns (image, scale) where scale maps back to gray."""
+    height, width = gray.shape[:2]
+    if not DETECTION_WIDTH or width <= DETECTION_WIDTH:
+        return gray, 1.0
+    scale = DETECTION_WIDTH / width
+    small = cv2.resize(gray, (DETECTION_WIDTH, int(round(height * scale))), interpolation=cv2.INTER_AREA)
+    return small, scale
+
+def detect_faces(gray, session):
+    """Detect faces, tracking the session's last face box between periodic full detections."""
+    if TRACKING_ENABLED and session.last_box is not None and session.frames_since_detect < DETECT_EVERY_N_FRAMES:
+        box, confidence = _track_face(gray, session.last_box)
+        if box is not None:
+            session.last_box = box
+            session.face_confidence = confidence
+            session.frames_since_detect += 1
+            return [box]
+        logger.debug(f"Face tracking lost (session: {session.session_id})")
+
+    small, scale = _detection_image(gray)
+    faces, neighbours = face_cascade.detectMultiScale2(small, 1.3, 5)
+    if scale != 1.0 and len(faces) > 0:
+        # Boxes come back in full-resolution coordinates so eyes and gaze use the original pixels
+        faces = np.round(np.asarray(faces) / scale).astype(int)
+    session.frames_since_detect = 0
+    if len(faces) > 0:
+        session.last_box, session.face_confidence = _best_face(faces, neighbours)
+    else:
+        session.last_box = None
+        session.face_confidence = 0
+    return faces
+
+def decode_frame(image_data):
+    """Decode a frame given as raw encoded bytes (bytes/bytearray/memoryview) or a base64 data URL."""
+    if isinstance(image_data, str):
+        image_data = base64.b64decode(image_data.split(',')[1])
+    # np.frombuffer wraps the buffer without copying; imdecode reads it in place
+    np_arr = np.frombuffer(image_data, np.uint8)
+    frame = cv2.imdecode(np_arr, cv2.IMREAD_COLOR)
+    if frame is None:
+        raise ValueError("Failed to decode image")
+    return frame
+
+def process_image(image_data, session=None, now=None):
+    if session is None:
+        session = sessions.get(DEFAULT_SESSION_ID)
+    with session.lock:
+        try:
+            started = time.perf_counter()
+            frame = decode_frame(image_data)
+            gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+            faces = detect_faces(gray, session)
+            current_time = now if now is not None else time.time()
+
+            face_detected = len(faces) > 0
+            looking_at_screen = False
+            look_direction = "Unknown"
+            eyes_closed = False
+            blink_duration = 0
+            violation_detected = False
+
+            if not face_detected:
+                violation_detected = _register_look_away(session, current_time)
+            else:
+                session.looking_away = False
+                for (x, y, w, h) in faces:
+                    roi_gray = gray[y:y + h, x:x + w]
+                    eyes = eye_cascade.detectMultiScale(roi_gray, 1.1, 5)
+                    if len(eyes) == 0:
+                        eyes_closed = True
+                        blink_duration = current_time - (session.looking_away_start_time if session.looking_away else current_time)
+                        if blink_duration > 2:
+                            session.long_blink_count += 1
+                    else:
+                        for (ex, ey, ew, eh) in eyes:
+                            eye_frame = roi_gray[ey:ey + eh, ex:ex + ew]
+                            direction, _ = detect_gaze(eye_frame)
+                            look_direction = direction
+                            looking_at_screen = direction == "center"
+                            break
+                    if not looking_at_screen:
+                        violation_detected = _register_look_away(session, current_time)
+
+            proctor_data = {
+                "session_id": session.session_id,
+                "face_detected": face_detected,
+                "looking_at_screen": looking_at_screen,
+                "warnings": session.warnings,
+                "max_warnings": max_warnings,
+                "violation_detected": violation_detected,
+                "look_direction": look_direction,
+                "eyes_closed": eyes_closed,
+                "blink_duration": blink_duration,
+                "long_blink_count": session.long_blink_count,
+                "head_pose": [0, 0, 0],
+                "ear": 0
+            }
+            latency_stats.record(str(DETECTION_WIDTH or "native"), time.perf_counter() - started)
+            event_log.record(session, proctor_data, current_time)
+            logger.debug(f"Proctor data: {proctor_data}")
+            return proctor_data
+        except Exception as e:
+            logger.error(f"Error processing image: {e}")
+            return {
+                "session_id": session.session_id,
+                "face_detected": False,
+                "looking_at_screen": False,
+                "warnings": session.warnings,
+                "max_warnings": max_warnings,
+                "violation_detected": False,
+                "look_direction": "Unknown",
+                "eyes_closed": False,
+                "blink_duration": 0,
+                "long_blink_count": session.long_blink_count,
+                "head_pose": [0, 0, 0],
+                "ear": 0,
+                "error": str(e)
+            }
+
+class FrameQueueFull(Exception):
+    pass
+
+class FrameEngine:
+    """Bounded, batched frame-processing pool shared by all exam sessions.
+
+    Each session has at most one pending frame. A newer frame for the same session
+    replaces the stale one and its waiters receive the newer frame's result, so a
+    slow server drops old frames instead of building up latency. A worker takes an
+    even share of the pending frames across itself and the idle workers (at most
+    batch_size) and wakes another worker if frames remain, so a burst is spread over
+    the whole pool rather than run back to back by one thread. OpenCV releases the
+    GIL during detection, so threads scale cascade throughput with the core count.
+    """
+
+    def __init__(self, workers=FRAME_WORKERS, max_pending=FRAME_QUEUE_SIZE, batch_size=FRAME_BATCH_SIZE):
+        self.workers = max(1, workers)
+        self.max_pending = max_pending
+        self.batch_size = max(1, batch_size)
+        self._cond = threading.Condition()
+        self._pending = {}
+        self._order = deque()
+        self._threads = []
+        self._running = False
+        self._idle = 0
+        self.processed = 0
+        self.dropped = 0
+        self.rejected = 0
+
+    def start(self):
+        with self._cond:
+            if self._running:
+                return
+            self._running = True
+        if self.workers > 1:
+            # Parallelism comes from the pool; keep each cascade call single-threaded
+            cv2.setNumThreads(1)
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._worker, name=f"frame-worker-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        logger.info(f"Frame engine started with {self.workers} workers (queue: {self.max_pending}, batch: {self.batch_size})")
+
+    def stop(self):
+        with self._cond:
+            self._running = False
+            self._cond.notify_all()
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+
+    def submit(self, session, image_data):
+        with self._cond:
+            slot = self._pending.get(session.session_id)
+            if slot is not None:
+                slot[0] = image_data
+                self.dropped += 1
+                return slot[1]
+            if len(self._pending) >= self.max_pending:
+                self.rejected += 1
+                raise FrameQueueFull("Frame queue is full")
+            future = Future()
+            self._pending[session.session_id] = [image_data, future, session]
+            self._order.append(session.session_id)
+            self._cond.notify()
+            return future
+
+    def process(self, session, image_data, timeout=FRAME_TIMEOUT):
+        return self.submit(session, image_data).result(timeout=timeout)
+
+    def stats(self):
+        with self._cond:
+            return {
+                "workers": self.workers,
+                "pending": len(self._pending),
+                "max_pending": self.max_pending,
+                "batch_size": self.batch_size,
+                "processed": self.processed,
+                "dropped": self.dropped,
+                "rejected": self.rejected
+            }
+
+    def _next_batch(self):
+        with self._cond:
+            while self._running and not self._order:
+                self._idle += 1
+                self._cond.wait()
+                self._idle -= 1
+            share = min(self.batch_size, -(-len(self._order) // (self._idle + 1)))
+            batch = [self._pending.pop(self._order.popleft()) for _ in range(share)]
+            if self._order:
+                self._cond.notify()
+            return batch
+
+    def _worker(self):
+        while True:
+            batch = self._next_batch()
+            if not batch:
+                return
+            for image_data, future, session in batch:
+                if not future.set_running_or_notify_cancel():
+                    continue
+                try:
+                    future.set_result(process_image(image_data, session))
+                except Exception as e:
+                    future.set_exception(e)
+            with self._cond:
+                self.processed += len(batch)
+
+frame_engine = FrameEngine()
+frame_engine.start()
+
+def get_session_id(data=None, default=DEFAULT_SESSION_ID):
+    """Resolve the exam session ID from the JSON body, query string or X-Session-ID header."""
+    session_id = None
+    if data:
+        session_id = data.get('session_id')
+    if not session_id:
+        session_id = request.args.get('session_id') or request.headers.get('X-Session-ID')
+    return session_id or default
 
 @app.route('/start-exam', methods=['POST'])
 def start_exam():
-    global warnings, long_blink_count
-    warnings = 0
-    long_blink_count = 0
-    logger.info("Exam session started")
-    return jsonify({"status": "Exam started"}), 200
+    data = request.get_json(silent=True) or {}
+    session_id = get_session_id(data, default=None) or uuid.uuid4().hex
+    sessions.start(session_id)
+    logger.info(f"Exam session started: {session_id} ({len(sessions)} active)")
+    return jsonify({"status": "Exam started", "session_id": session_id}), 200
+
+def _read_upload(file_storage):
+    """Return the uploaded blob as a buffer, avoiding a copy when it is already in memory."""
+    stream = file_storage.stream
+    if hasattr(stream, 'getbuffer'):
+        return stream.getbuffer()
+    return stream.read()
+
+def read_frame_payload():
+    """Extract (image_data, session_id) from a raw image body, a multipart blob or base64 JSON."""
+    mimetype = request.mimetype
+    if mimetype in BINARY_FRAME_MIMETYPES:
+        return request.get_data(cache=False), get_session_id()
+    if mimetype == 'multipart/form-data':
+        upload = request.files.get('image') or request.files.get('frame')
+        if upload is None:
+            return None, None
+        return _read_upload(upload), get_session_id(request.form)
+    data = request.get_json(silent=True)
+    if not data or 'image' not in data:
+        return None, None
+    return data['image'], get_session_id(data)
 
 @app.route('/process-frame', methods=['POST'])
 def process_frame():
     try:
-        data = request.json
-        if not data or 'image' not in data:
+        image_data, session_id = read_frame_payload()
+        if not image_data:
             logger.error("No image data provided")
             return jsonify({"error": "No image data provided"}), 400
-        logger.debug("Received frame for processing")
-        proctor_data = process_image(data['image'])
+        session = sessions.get(session_id)
+        logger.debug(f"Received {request.mimetype} frame for processing (session: {session.session_id})")
+        proctor_data = frame_engine.process(session, image_data)
         return jsonify(proctor_data), 200
+    except FrameQueueFull as e:
+        logger.warning(f"Dropping frame: {e}")
+        return jsonify({"error": str(e)}), 503
+    except FrameTimeout:
+        logger.warning("Frame processing timed out")
+        return jsonify({"error": "Frame processing timed out"}), 503
     except Exception as e:
         logger.error(f"Error in process_frame: {e}")
         return jsonify({"error": str(e)}), 500
 
 @app.route('/end-exam', methods=['POST'])
 def end_exam():
-    global warnings, long_blink_count
-    warnings = 0
-    long_blink_count = 0
-    logger.info("Exam session ended")
-    return jsonify({"status": "Exam ended"}), 200
+    data = request.get_json(silent=True) or {}
+    session_id = get_session_id(data)
+    session = sessions.end(session_id)
+    summary = {"status": "Exam ended", "session_id": session_id}
+    if session is not None:
+        summary["warnings"] = session.warnings
+        summary["long_blink_count"] = session.long_blink_count
+    logger.info(f"Exam session ended: {session_id} ({len(sessions)} active)")
+    return jsonify(summary), 200
+
+def diff_proctor_data(previous, current):
+    """Return the keys of current whose values differ from previous (all of them if previous is None)."""
+    if previous is None:
+        return dict(current)
+    changes = {key: value for key, value in current.items() if previous.get(key) != value}
+    if "error" in previous and "error" not in current:
+        changes["error"] = None
+    return changes
+
+@sock.route('/ws/proctor')
+def proctor_stream(ws):
+    """Persistent per-session channel: binary frames in, proctor-state deltas out.
+
+    Binary messages are encoded frames. Text messages are JSON control messages:
+    {"type": "image", "image": <data URL>} for the base64 fallback,
+    {"type": "snapshot"} to receive the full state with the next frame and {"type": "end"} to end the exam.
+    """
+    session = sessions.get(get_session_id())
+    logger.info(f"Proctor stream opened (session: {session.session_id})")
+    last_sent = None
+    seq = 0
+    try:
+        ws.send(json.dumps({"type": "ready", "session_id": session.session_id}))
+        while True:
+            message = ws.receive()
+            if message is None:
+                continue
+            if isinstance(message, str):
+                try:
+                    control = json.loads(message)
+                except ValueError:
+                    control = None
+                if not isinstance(control, dict):
+                    ws.send(json.dumps({"type": "error", "error": "Control messages must be JSON objects"}))
+                    continue
+                kind = control.get("type")
+                if kind == "end":
+                    sessions.end(session.session_id)
+                    ws.send(json.dumps({"type": "ended", "session_id": session.session_id,
+                                        "warnings": session.warnings,
+                                        "long_blink_count": session.long_blink_count}))
+                    ws.close()
+                    break
+                if kind == "snapshot":
+                    last_sent = None
+                    continue
+                if kind != "image" or not control.get("image"):
+                    ws.send(json.dumps({"type": "error", "error": f"Unsupported message: {kind}"}))
+                    continue
+                message = control["image"]
+
+            try:
+                proctor_data = frame_engine.process(session, message)
+            except (FrameQueueFull, FrameTimeout):
+                continue
+            changes = diff_proctor_data(last_sent, proctor_data)
+            last_sent = proctor_data
+            if not changes:
+                continue
+            seq += 1
+            ws.send(json.dumps({"type": "delta", "seq": seq, "changes": changes}))
+    except ConnectionClosed:
+        pass
+    except Exception as e:
+        logger.error(f"Error in proctor_stream: {e}")
+    logger.info(f"Proctor stream closed (session: {session.session_id})")
+
+@app.route('/engine-stats', methods=['GET'])
+def engine_stats():
+    stats = frame_engine.stats()
+    stats["active_sessions"] = len(sessions)
+    stats["detection_width"] = DETECTION_WIDTH
+    stats["latency"] = latency_stats.summary()
+    stats["events"] = {"pending": event_log.pending(), "written": event_log.written, "dropped": event_log.dropped}
+    return jsonify(stats), 200
+
+@app.route('/proctor-events', methods=['GET'])
+def get_proctor_events():
+    session_id = request.args.get('session_id')
+    if not session_id:
+        return jsonify({"error": "session_id is required"}), 400
+    limit = min(request.args.get('limit', 500, type=int), 5000)
+    try:
+        events = proctor_events_collection.find(
+            {"session_id": session_id}, {"_id": 0}
+        ).sort("timestamp", 1).limit(limit)
+        return jsonify({"session_id": session_id, "events": list(events)}), 200
+    except Exception as e:
+        logger.error(f"Error in get_proctor_events: {e}")
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/alerts', methods=['GET'])
+def get_alerts():
+    session_id = request.args.get('session_id')
+    since = request.args.get('since', 0, type=float)
+    return jsonify({
+        "alerts": alert_subscribers.recent(session_id, since),
+        "dropped": alert_dispatcher.dropped
+    }), 200
 
 @app.route('/toggle_alerts', methods=['GET'])
 def toggle_alerts():
@@ -0,0 +1,279 @@
+"""Offline benchmark and replay harness for facetrack.
+
+Replays recorded or synthetic frame sequences through facetrack.process_image
+and every detect_gaze pupil locator without Flask, and reports latency
+percentiles, frames per second per core and peak memory for each
+configuration. Proctor decisions of every configuration are compared against
+the first one, so tuning changes can be checked for regressions before they
+ship.
+
+Examples:
+    python facetrack_bench.py --frames recordings/session1
+    python facetrack_bench.py --video exam.mp4 --config native:DETECTION_WIDTH=0,TRACKING_ENABLED=false \\
+        --config fast:DETECTION_WIDTH=320,DETECT_EVERY_N_FRAMES=10 --min-agreement 0.95
+    python facetrack_bench.py --synthetic 200 --face-image face.jpg --json results.json
+"""
+import argparse
+import json
+import logging
+import os
+import resource
+import sys
+import time
+import tracemalloc
+
+import cv2
+import numpy as np
+
+import facetrack
+
+# Settings a configuration may override on the facetrack module
+TUNABLE_SETTINGS = {
+    "DETECTION_WIDTH": int,
+    "TRACKING_ENABLED": lambda value: value.lower() == "true",
+    "DETECT_EVERY_N_FRAMES": int,
+    "TRACK_ROI_PADDING": float,
+    "TRACK_FACE_SIZE": int,
+    "TRACK_SCALE_FACTOR": float,
+    "GAZE_METHOD": str,
+}
+
+DEFAULT_CONFIGS = [
+    "native:DETECTION_WIDTH=0,TRACKING_ENABLED=false",
+    "default:",
+]
+
+# Proctor decision fields compared across configurations
+DECISION_FIELDS = ("face_detected", "looking_at_screen", "look_direction", "warnings", "violation_detected")
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp", ".webp")
+
+def parse_config(spec):
+    """Parse 'name:KEY=value,KEY=value' into (name, {KEY: value})."""
+    name, _, assignments = spec.partition(":")
+    settings = {}
+    for assignment in filter(None, assignments.split(",")):
+        key, _, value = assignment.partition("=")
+        key = key.strip().upper()
+        if key not in TUNABLE_SETTINGS:
+            raise ValueError(f"Unknown setting {key}; expected one of {', '.join(TUNABLE_SETTINGS)}")
+        settings[key] = TUNABLE_SETTINGS[key](value.strip())
+    return name or spec, settings
+
+def load_frames_from_dir(path, limit=None):
+    names = sorted(n for n in os.listdir(path) if n.lower().endswith(IMAGE_EXTENSIONS))
+    for name in names[:limit]:
+        frame = cv2.imread(os.path.join(path, name))
+        if frame is not None:
+            yield frame
+
+def load_frames_from_video(path, limit=None):
+    capture = cv2.VideoCapture(path)
+    try:
+        count = 0
+        while limit is None or count < limit:
+            ok, frame = capture.read()
+            if not ok:
+                break
+            count += 1
+            yield frame
+    finally:
+        capture.release()
+
+def synthetic_frames(count, size=(640, 480), face_image=None, seed=0):
+    """Noisy background frames; with face_image, the face drifts and is sometimes absent."""
+    rng = np.random.default_rng(seed)
+    width, height = size
+    face = None
+    if face_image:
+        face = cv2.imread(face_image)
+        if face is None:
+            raise ValueError(f"Could not read face image: {face_image}")
+        scale = min(width, height) * 0.5 / max(face.shape[:2])
+        face = cv2.resize(face, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+    x, y = width // 4, height // 4
+    for i in range(count):
+        frame = rng.integers(90, 140, size=(height, width, 3), dtype=np.uint8)
+        # Leave the seat empty for a stretch every 50 frames to exercise the warning logic
+        if face is not None and (i // 25) % 2 == 0:
+            x = int(np.clip(x + rng.integers(-4, 5), 0, width - face.shape[1]))
+            y = int(np.clip(y + rng.integers(-4, 5), 0, height - face.shape[0]))
+            frame[y:y + face.shape[0], x:x + face.shape[1]] = face
+        yield frame
+
+def encode_frames(frames, quality=70):
+    """JPEG-encode frames once up front, matching what webCam.jsx sends."""
+    params = [cv2.IMWRITE_JPEG_QUALITY, quality]
+    return [cv2.imencode(".jpg", frame, params)[1].tobytes() for frame in frames]
+
+def apply_settings(settings):
+    previous = {key: getattr(facetrack, key) for key in settings}
+    for key, value in settings.items():
+        setattr(facetrack, key, value)
+    return previous
+
+def latency_summary(latencies):
+    samples = np.asarray(latencies) * 1000
+    return {
+        "mean_ms": round(float(samples.mean()), 3),
+        "p50_ms": round(float(np.percentile(samples, 50)), 3),
+        "p95_ms": round(float(np.percentile(samples, 95)), 3),
+        "p99_ms": round(float(np.percentile(samples, 99)), 3),
+    }
+
+def replay(encoded_frames, name, settings, frame_interval):
+    """Run one configuration over the encoded frames with a simulated clock."""
+    previous = apply_settings(settings)
+    session = facetrack.ProctorSession(f"bench-{name}")
+    latencies = []
+    decisions = []
+    tracemalloc.start()
+    cpu_started = time.process_time()
+    try:
+        for i, data in enumerate(encoded_frames):
+            started = time.perf_counter()
+            result = facetrack.process_image(data, session, now=i * frame_interval)
+            latencies.append(time.perf_counter() - started)
+            decisions.append({field: result.get(field) for field in DECISION_FIELDS})
+        cpu_seconds = time.process_time() - cpu_started
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+        apply_settings(previous)
+
+    report = {"name": name, "settings": settings, "frames": len(encoded_frames)}
+    report.update(latency_summary(latencies))
+    report["fps_per_core"] = round(len(encoded_frames) / cpu_seconds, 2) if cpu_seconds else None
+    report["peak_traced_mb"] = round(peak / 2 ** 20, 2)
+    return report, decisions
+
+def extract_eye_crops(frames, limit=500):
+    """Collect grayscale eye crops with the reference cascades for detect_gaze timing."""
+    crops = []
+    for frame in frames:
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        for (x, y, w, h) in facetrack.face_cascade.detectMultiScale(gray, 1.3, 5):
+            roi_gray = gray[y:y + h, x:x + w]
+            for (ex, ey, ew, eh) in facetrack.eye_cascade.detectMultiScale(roi_gray, 1.1, 5):
+                crops.append(roi_gray[ey:ey + eh, ex:ex + ew].copy())
+                if len(crops) >= limit:
+                    return crops
+    return crops
+
+def bench_gaze(crops, repeat=5):
+    """Time every pupil locator on the eye crops and compare its directions with "contour"."""
+    reports = []
+    reference = None
+    for method in facetrack.PUPIL_LOCATORS:
+        latencies = []
+        directions = []
+        for _ in range(repeat):
+            directions = []
+            for crop in crops:
+                started = time.perf_counter()
+                direction, _ = facetrack.detect_gaze(crop, method)
+                latencies.append(time.perf_counter() - started)
+                directions.append(direction)
+        report = {"method": method, "eye_crops": len(crops)}
+        if latencies:
+            report.update(latency_summary(latencies))
+        if reference is None:
+            reference = directions
+        elif directions:
+            matches = sum(a == b for a, b in zip(reference, directions))
+            report["agreement"] = round(matches / len(directions), 4)
+        reports.append(report)
+    return reports
+
+def compare_decisions(reference, candidate):
+    """Per-field agreement ratio of candidate decisions against the reference run."""
+    frames = min(len(reference), len(candidate))
+    if not frames:
+        return {}
+    agreement = {}
+    for field in DECISION_FIELDS:
+        matches = sum(reference[i][field] == candidate[i][field] for i in range(frames))
+        agreement[field] = round(matches / frames, 4)
+    return agreement
+
+def print_report(reports, gaze_reports):
+    header = f"{'config':<16}{'frames':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'fps/core':>10}{'peak MB':>10}  agreement"
+    print(header)
+    print("-" * len(header))
+    for report in reports:
+        agreement = report.get("agreement")
+        agreement_text = "reference" if agreement is None else ", ".join(f"{k}={v:.3f}" for k, v in agreement.items())
+        print(f"{report['name']:<16}{report['frames']:>8}{report['p50_ms']:>10.2f}{report['p95_ms']:>10.2f}"
+              f"{report['p99_ms']:>10.2f}{report['fps_per_core'] or 0:>10.1f}{report['peak_traced_mb']:>10.2f}  {agreement_text}")
+    if gaze_reports and gaze_reports[0]["eye_crops"]:
+        print(f"\ndetect_gaze over {gaze_reports[0]['eye_crops']} eye crops:")
+        for report in gaze_reports:
+            agreement = report.get("agreement")
+            agreement_text = "reference" if agreement is None else f"agreement={agreement:.3f}"
+            print(f"  {report['method']:<12} p50 {report['p50_ms']:.3f} ms, p95 {report['p95_ms']:.3f} ms, "
+                  f"p99 {report['p99_ms']:.3f} ms  {agreement_text}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replay frames through facetrack and report performance")
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument("--frames", help="Directory of recorded frames (sorted by file name)")
+    source.add_argument("--video", help="Recorded video file")
+    source.add_argument("--synthetic", type=int, default=200, help="Number of synthetic frames (default: 200)")
+    parser.add_argument("--face-image", help="Face image pasted into synthetic frames")
+    parser.add_argument("--size", default="640x480", help="Synthetic frame size WIDTHxHEIGHT")
+    parser.add_argument("--limit", type=int, help="Maximum frames to load from --frames/--video")
+    parser.add_argument("--fps", type=float, default=5.0, help="Simulated capture rate (webCam.jsx sends 5 fps)")
+    parser.add_argument("--config", action="append", help="name:KEY=value,... (repeatable; first is the reference)")
+    parser.add_argument("--min-agreement", type=float, help="Exit non-zero if any decision field agrees less than this")
+    parser.add_argument("--json", help="Write the full report to this file")
+    args = parser.parse_args(argv)
+
+    facetrack.ALERT_ENABLED = False
+    facetrack.event_log.enabled = False
+    logging.getLogger("facetrack").setLevel(logging.ERROR)
+
+    if args.frames:
+        frames = list(load_frames_from_dir(args.frames, args.limit))
+    elif args.video:
+        frames = list(load_frames_from_video(args.video, args.limit))
+    else:
+        width, height = (int(v) for v in args.size.lower().split("x"))
+        frames = list(synthetic_frames(args.synthetic, (width, height), args.face_image))
+    if not frames:
+        parser.error("No frames loaded")
+
+    encoded = encode_frames(frames)
+    configs = [parse_config(spec) for spec in (args.config or DEFAULT_CONFIGS)]
+
+    reports = []
+    reference = None
+    for name, settings in configs:
+        report, decisions = replay(encoded, name, settings, 1.0 / args.fps)
+        if reference is None:
+            reference = decisions
+        else:
+            report["agreement"] = compare_decisions(reference, decisions)
+        reports.append(report)
+
+    gaze_reports = bench_gaze(extract_eye_crops(frames))
+    print_report(reports, gaze_reports)
+    print(f"\nMax RSS: {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:.1f} MB")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"configs": reports, "detect_gaze": gaze_reports}, f, indent=2)
+
+    if args.min_agreement is not None:
+        failing = [
+            (report["name"], field, value)
+            for report in reports
+            for field, value in report.get("agreement", {}).items()
+            if value < args.min_agreement
+        ]
+        for name, field, value in failing:
+            print(f"REGRESSION: {name} {field} agreement {value:.3f} < {args.min_agreement}")
+        return 1 if failing else 0
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,143 @@
+"""Two-tier LLM response cache for the quiz generator.
+
+TieredLLMCache plugs into LangChain's cache hook (`ChatGroq(cache=...)`), so it
+covers every call made through the `llm` object: MultiQueryRetriever query
+expansion as well as question generation. Entries are keyed by a SHA-256 of the
+rendered prompt and LangChain's llm_string, which carries the model name,
+temperature and other invocation parameters. Lookups go to an in-memory LRU
+first and then to a Mongo collection.
+
+Wrap a call in `fresh_generation()` to skip cached answers; the fresh result
+still replaces the cached one.
+
+A reply is cached as soon as the model returns it, before the caller has parsed
+it. Callers that find a reply unusable drop it with `evict_reply()`, so a
+malformed answer is not served again for the same prompt.
+
+LangChain's stream() does not consult the cache, so streamed calls go through
+stream_with_cache(), which uses the same keys as invoke() and batch().
+"""
+import hashlib
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime
+
+from langchain_core.caches import BaseCache
+from langchain_core.load import dumps, loads
+from langchain_core.messages import AIMessage
+from langchain_core.outputs import ChatGeneration
+
+_bypass_cache = ContextVar("llm_cache_bypass", default=False)
+
+@contextmanager
+def fresh_generation(enabled=True):
+    """Force fresh LLM responses for calls made in this context (and LangChain batch threads it spawns)."""
+    token = _bypass_cache.set(enabled)
+    try:
+        yield
+    finally:
+        _bypass_cache.reset(token)
+
+def cache_key(prompt, llm_string):
+    return hashlib.sha256(f"{llm_string}\0{prompt}".encode("utf-8")).hexdigest()
+
+class TieredLLMCache(BaseCache):
+    def __init__(self, collection=None, max_entries=1000):
+        self.collection = collection
+        self.max_entries = max_entries
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _remember(self, key, value):
+        with self._lock:
+            self._memory[key] = value
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_entries:
+                self._memory.popitem(last=False)
+
+    def lookup(self, prompt, llm_string):
+        if _bypass_cache.get():
+            return None
+        key = cache_key(prompt, llm_string)
+        with self._lock:
+            value = self._memory.get(key)
+            if value is not None:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return value
+        if self.collection is not None:
+            try:
+                doc = self.collection.find_one({"_id": key}, {"value": 1})
+                if doc:
+                    value = loads(doc["value"])
+                    self._remember(key, value)
+                    self.hits += 1
+                    return value
+            except Exception as e:
+                print(f"LLM cache lookup failed: {str(e)}")
+        self.misses += 1
+        return None
+
+    def update(self, prompt, llm_string, return_val):
+        key = cache_key(prompt, llm_string)
+        self._remember(key, return_val)
+        if self.collection is not None:
+            try:
+                self.collection.replace_one(
+                    {"_id": key},
+                    {"_id": key, "llm_string": llm_string, "value": dumps(return_val), "createdDate": datetime.now()},
+                    upsert=True
+                )
+            except Exception as e:
+                print(f"LLM cache write failed: {str(e)}")
+
+    def evict(self, prompt, llm_string):
+        key = cache_key(prompt, llm_string)
+        with self._lock:
+            self._memory.pop(key, None)
+        if self.collection is not None:
+            try:
+                self.collection.delete_one({"_id": key})
+            except Exception as e:
+                print(f"LLM cache eviction failed: {str(e)}")
+
+    def clear(self, **kwargs):
+        with self._lock:
+            self._memory.clear()
+        if self.collection is not None:
+            self.collection.delete_many({})
+
+def _llm_cache(llm):
+    return llm.cache if isinstance(llm.cache, BaseCache) else None
+
+def evict_reply(llm, messages):
+    """Drop the cached reply to messages, e.g. because it did not parse."""
+    cache = _llm_cache(llm)
+    if isinstance(cache, TieredLLMCache):
+        cache.evict(dumps(messages), llm._get_llm_string())
+
+def stream_with_cache(llm, messages):
+    """Yield the text of an LLM reply as it streams, answering from llm.cache when possible.
+
+    A cached reply is yielded as one piece; a streamed reply is stored once complete.
+    """
+    cache = _llm_cache(llm)
+    if cache is None:
+        for chunk in llm.stream(messages):
+            yield chunk.content
+        return
+    prompt = dumps(messages)
+    llm_string = llm._get_llm_string()
+    cached = cache.lookup(prompt, llm_string)
+    if cached:
+        yield cached[0].text
+        return
+    parts = []
+    for chunk in llm.stream(messages):
+        parts.append(chunk.content)
+        yield chunk.content
+    cache.update(prompt, llm_string, [ChatGeneration(message=AIMessage(content="".join(parts)))])
@@ -0,0 +1,233 @@
+"""Per-question item statistics for each quiz form.
+
+The question_stats collection holds one document per form with counters only:
+
+    responses                          evaluated responses
+    score_counts.<score>               responses with that total score
+    questions.<i>.attempts / correct   per question
+    questions.<i>.correct_by_score.<score>
+    questions.<i>.choices.<option index | unanswered | other>
+
+Counters are small (questions x score levels x options), can be maintained
+with $inc as each response is evaluated (record_response), and can be rebuilt
+by streaming user_response one form at a time (rebuild_question_stats), so
+memory stays bounded however many responses there are. Responses counted
+here are stamped with question_stats_version; only a stamped earlier evaluation
+is retracted on re-evaluation, and a rebuild stamps every response it counts.
+item_statistics()
+derives the figures the dashboard shows from one document:
+
+    p_value          share of responses answering correctly
+    discrimination   p(correct) in the top 27% of total scores minus the bottom 27%
+    point_biserial   correlation of the item with the rest of the test
+    distractors      share of responses choosing each option
+
+Batch rebuild (all forms, or one):
+    python question_stats.py [--form-id FORM_ID]
+"""
+import argparse
+import math
+import os
+import sys
+from collections import defaultdict
+from datetime import datetime
+
+from pymongo import MongoClient
+
+# Stored on each user_response counted in question_stats; bump when the counters change shape
+QUESTION_STATS_VERSION = 1
+
+# Share of responses in each of the upper and lower groups for the discrimination index
+DISCRIMINATION_GROUP = 0.27
+
+def _normalize(text):
+    return " ".join(str(text).lower().split())
+
+def choice_key(question, user_answer):
+    """Option index chosen for a question, or "unanswered" / "other"."""
+    if not user_answer or user_answer == "Not answered":
+        return "unanswered"
+    answer = _normalize(user_answer)
+    for idx, option in enumerate(question.get("options", [])):
+        if _normalize(option) == answer:
+            return str(idx)
+    return "other"
+
+def response_increments(questions, evaluation, sign=1):
+    """$inc fields one evaluated response contributes to its form (sign=-1 to retract it)."""
+    score = str(int(evaluation.get("score", 0)))
+    increments = {"responses": sign, f"score_counts.{score}": sign}
+    for idx, (question, result) in enumerate(zip(questions, evaluation.get("question_results", []))):
+        prefix = f"questions.{idx}"
+        increments[f"{prefix}.attempts"] = sign
+        if result.get("is_correct"):
+            increments[f"{prefix}.correct"] = sign
+            increments[f"{prefix}.correct_by_score.{score}"] = sign
+        increments[f"{prefix}.choices.{choice_key(question, result.get('user_answer'))}"] = sign
+    return increments
+
+def question_fields(questions):
+    fields = {}
+    for idx, question in enumerate(questions):
+        fields[f"questions.{idx}.question"] = question.get("question_text", "")
+        fields[f"questions.{idx}.options"] = question.get("options", [])
+        fields[f"questions.{idx}.correct_answer"] = question.get("correct_answer", "")
+    return fields
+
+def _apply(collection, form_id, questions, changes):
+    increments = defaultdict(int)
+    for evaluation, sign in changes:
+        for field, value in response_increments(questions, evaluation, sign).items():
+            increments[field] += value
+    update = {"$set": {"updatedDate": datetime.now(), **question_fields(questions)}}
+    changed = {field: value for field, value in increments.items() if value}
+    if changed:
+        update["$inc"] = changed
+    collection.update_one({"_id": form_id}, update, upsert=True)
+
+def record_response(collection, form_id, questions, evaluation, previous=None):
+    """Incremental mode: fold one evaluation into its form's counters, retracting previous if given.
+
+    questions are the form's questions as stored in form_responses.
+    """
+    _apply(collection, form_id, questions, ([(previous, -1)] if previous else []) + [(evaluation, 1)])
+
+def retract_response(collection, form_id, questions, evaluation):
+    """Take a counted evaluation back out of its form's counters."""
+    _apply(collection, form_id, questions, [(evaluation, -1)])
+
+def _nest(flat):
+    """Turn {"a.b.c": 1} counters into nested dicts, as MongoDB stores them."""
+    nested = {}
+    for path, value in flat.items():
+        node = nested
+        *parents, leaf = path.split(".")
+        for part in parents:
+            node = node.setdefault(part, {})
+        node[leaf] = value
+    return nested
+
+def rebuild_question_stats(db, form_id=None, batch_size=500):
+    """Batch mode: recompute stats by streaming evaluated responses, one form at a time.
+
+    Responses are read sorted by form_id (served by the form_id+createdDate index), so
+    only the current form's counters are held in memory.
+    """
+    query = {"question_results": {"$exists": True}}
+    if form_id:
+        query["form_id"] = form_id
+    fields = {"form_id": 1, "score": 1, "question_results": 1}
+    cursor = db.user_response.find(query, fields).sort("form_id", 1).batch_size(batch_size)
+
+    current_form = None
+    questions = []
+    counters = defaultdict(int)
+    forms = 0
+
+    def flush():
+        if current_form is None:
+            return
+        doc = {"_id": current_form, "updatedDate": datetime.now(), **_nest({**question_fields(questions), **counters})}
+        db.question_stats.replace_one({"_id": current_form}, doc, upsert=True)
+
+    for response in cursor:
+        if response["form_id"] != current_form:
+            flush()
+            current_form = response["form_id"]
+            form = db.form_responses.find_one({"form_id": current_form}, {"questions": 1}) or {}
+            questions = form.get("questions", [])
+            counters = defaultdict(int)
+            forms += 1
+        for field, value in response_increments(questions, response).items():
+            counters[field] += value
+    flush()
+    db.user_response.update_many(query, {"$set": {"question_stats_version": QUESTION_STATS_VERSION}})
+    print(f"Rebuilt question stats for {forms} forms")
+    return forms
+
+def _discrimination(score_counts, correct_by_score, responses):
+    """Upper minus lower group correct rate, splitting tied boundary scores proportionally."""
+    group = DISCRIMINATION_GROUP * responses
+    if group <= 0:
+        return None
+
+    def group_rate(scores):
+        remaining = group
+        correct = 0.0
+        for score in scores:
+            taken = min(score_counts[score], remaining)
+            correct += taken * correct_by_score.get(score, 0) / score_counts[score]
+            remaining -= taken
+            if remaining <= 0:
+                break
+        return correct / group
+
+    scores = sorted(s for s in score_counts if score_counts[s] > 0)
+    return group_rate(reversed(scores)) - group_rate(scores)
+
+def _point_biserial(score_counts, correct_by_score, responses, correct):
+    """Item-rest correlation from score-level sums (rest = total score minus this item)."""
+    n = responses
+    sum_x = correct
+    sum_t = sum(s * c for s, c in score_counts.items())
+    sum_tt = sum(s * s * c for s, c in score_counts.items())
+    sum_xt = sum(s * c for s, c in correct_by_score.items())
+    sum_r = sum_t - sum_x
+    sum_rr = sum_tt - 2 * sum_xt + sum_x
+    sum_xr = sum_xt - sum_x
+    p = sum_x / n
+    variance_x = p * (1 - p)
+    variance_r = sum_rr / n - (sum_r / n) ** 2
+    if variance_x <= 0 or variance_r <= 1e-12:
+        return None
+    return (sum_xr / n - p * sum_r / n) / math.sqrt(variance_x * variance_r)
+
+def item_statistics(doc):
+    """Dashboard view of a question_stats document."""
+    responses = doc.get("responses", 0)
+    score_counts = {int(s): c for s, c in doc.get("score_counts", {}).items() if c > 0}
+    items = []
+    for idx, stats in sorted(doc.get("questions", {}).items(), key=lambda item: int(item[0])):
+        attempts = stats.get("attempts", 0)
+        correct = stats.get("correct", 0)
+        correct_by_score = {int(s): c for s, c in stats.get("correct_by_score", {}).items()}
+        options = stats.get("options", [])
+        choices = stats.get("choices", {})
+        item = {
+            "index": int(idx),
+            "question": stats.get("question", ""),
+            "attempts": attempts,
+            "p_value": round(correct / attempts, 4) if attempts else None,
+            "discrimination": None,
+            "point_biserial": None,
+            "distractors": [
+                {
+                    "option": option,
+                    "correct": option == stats.get("correct_answer"),
+                    "count": choices.get(str(i), 0),
+                    "frequency": round(choices.get(str(i), 0) / attempts, 4) if attempts else None,
+                }
+                for i, option in enumerate(options)
+            ],
+            "unanswered": choices.get("unanswered", 0),
+            "other": choices.get("other", 0),
+        }
+        if attempts and responses > 1:
+            discrimination = _discrimination(score_counts, correct_by_score, responses)
+            point_biserial = _point_biserial(score_counts, correct_by_score, responses, correct)
+            item["discrimination"] = round(discrimination, 4) if discrimination is not None else None
+            item["point_biserial"] = round(point_biserial, 4) if point_biserial is not None else None
+        items.append(item)
+    return {"form_id": doc["_id"], "responses": responses, "updatedDate": doc.get("updatedDate"), "questions": items}
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Rebuild per-question statistics from user_response")
+    parser.add_argument("--uri", default=os.getenv("MONGODB_URI", "mongodb://localhost:27017/"))
+    parser.add_argument("--database", default="eduquiz")
+    parser.add_argument("--form-id", help="Only rebuild this form")
+    args = parser.parse_args(argv)
+    rebuild_question_stats(MongoClient(args.uri)[args.database], args.form_id)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
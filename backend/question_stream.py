@@ -0,0 +1,62 @@
+"""Incremental question streaming for the quiz generator.
+
+The LLM returns questions as one JSON array. ArrayItemParser is fed the token
+stream and hands back each element of that array as soon as its closing brace
+arrives, so a question can be validated and sent to the client while the rest
+of the array is still being generated. sse_event formats server-sent events.
+"""
+import json
+
+class ArrayItemParser:
+    """Yield the items of a top-level JSON array incrementally as text is fed in.
+
+    Text before the opening bracket (e.g. a ```json fence) is ignored. Items that
+    are not valid JSON are skipped and counted in `skipped`; `closed` is set once
+    the array's closing bracket arrives. Only object and array items are returned.
+    """
+
+    def __init__(self):
+        self.skipped = 0
+        self.closed = False
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._item = []
+
+    def feed(self, text):
+        items = []
+        for ch in text:
+            if self._depth == 0:
+                if ch == "[":
+                    self._depth = 1
+                continue
+            if self._depth >= 2:
+                self._item.append(ch)
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                continue
+            if ch == '"':
+                self._in_string = True
+            elif ch in "{[":
+                if self._depth == 1:
+                    self._item = [ch]
+                self._depth += 1
+            elif ch in "}]":
+                self._depth -= 1
+                if self._depth == 0:
+                    self.closed = True
+                elif self._depth == 1:
+                    try:
+                        items.append(json.loads("".join(self._item)))
+                    except ValueError:
+                        self.skipped += 1
+                    self._item = []
+        return items
+
+def sse_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
@@ -0,0 +1,159 @@
+"""Materialised score analytics for the teacher dashboard.
+
+Every evaluation is folded into one document per subject and one per form in
+the quiz_analytics collection with $inc upserts: attempt count, sums and sums
+of squares of score and percentage, a percentage histogram and, per form,
+attempts and correct answers for each question. Reading analytics is then a
+single find_one by _id however many attempts exist.
+
+Re-evaluating a response first subtracts its previous evaluation, so the
+counters always describe the latest evaluation of each response. Only
+evaluations stamped with analytics_version == ANALYTICS_VERSION were counted
+and may be retracted; responses evaluated before the analytics existed are
+picked up by a rebuild, which stamps every response it counts.
+
+Rebuild from user_response after a schema change or data repair:
+    python quiz_analytics.py --rebuild
+"""
+import argparse
+import math
+import os
+import sys
+from collections import defaultdict
+from datetime import datetime
+
+from pymongo import MongoClient, UpdateOne
+
+# Stored on each user_response counted in quiz_analytics; bump when the counters change shape
+ANALYTICS_VERSION = 1
+
+HISTOGRAM_BIN_WIDTH = 10
+HISTOGRAM_BINS = 100 // HISTOGRAM_BIN_WIDTH
+
+def subject_key(subject):
+    return f"subject:{subject}"
+
+def form_key(form_id):
+    return f"form:{form_id}"
+
+def histogram_bin(percentage):
+    # 100% shares the top bin with 90-99%
+    return min(int(percentage // HISTOGRAM_BIN_WIDTH), HISTOGRAM_BINS - 1)
+
+def evaluation_increments(evaluation, sign=1):
+    """$inc fields contributed by one evaluation (sign=-1 to retract it), and per-form extras."""
+    score = evaluation.get("score", 0)
+    percentage = evaluation.get("percentage", 0)
+    common = {
+        "count": sign,
+        "score_sum": sign * score,
+        "score_sq_sum": sign * score * score,
+        "percentage_sum": sign * percentage,
+        "percentage_sq_sum": sign * percentage * percentage,
+        f"histogram.{histogram_bin(percentage)}": sign,
+    }
+    per_question = {}
+    for idx, result in enumerate(evaluation.get("question_results", [])):
+        per_question[f"questions.{idx}.attempts"] = sign
+        per_question[f"questions.{idx}.correct"] = sign if result.get("is_correct") else 0
+    return common, per_question
+
+def _apply(collection, changes, current=None):
+    """Write (evaluation, sign) changes in one bulk round trip; current supplies question texts."""
+    increments = defaultdict(lambda: defaultdict(int))
+    inserts = {}
+    for evaluation, sign in changes:
+        common, per_question = evaluation_increments(evaluation, sign)
+        for key, fields, extra in (
+            (subject_key(evaluation["subject"]), common, {"scope": "subject", "subject": evaluation["subject"]}),
+            (form_key(evaluation["form_id"]), {**common, **per_question}, {"scope": "form", "form_id": evaluation["form_id"]}),
+        ):
+            inserts[key] = extra
+            for field, value in fields.items():
+                increments[key][field] += value
+
+    now = datetime.now()
+    question_texts = {
+        f"questions.{idx}.question": result.get("question", "")
+        for idx, result in enumerate(current.get("question_results", []))
+    } if current else {}
+    operations = []
+    for key, fields in increments.items():
+        update = {"$set": {"updatedDate": now}, "$setOnInsert": inserts[key]}
+        changed = {field: value for field, value in fields.items() if value}
+        if changed:
+            update["$inc"] = changed
+        if current and key == form_key(current["form_id"]):
+            update["$set"].update(question_texts)
+        operations.append(UpdateOne({"_id": key}, update, upsert=True))
+    collection.bulk_write(operations, ordered=False)
+
+def record_evaluation(collection, evaluation, previous=None):
+    """Fold evaluation into its subject and form analytics (one bulk round trip).
+
+    previous is the response's earlier evaluation, if it had one, and is retracted
+    from whichever documents it was counted in.
+    """
+    _apply(collection, ([(previous, -1)] if previous else []) + [(evaluation, 1)], evaluation)
+
+def retract_evaluation(collection, evaluation):
+    """Take a counted evaluation back out of its subject and form analytics."""
+    _apply(collection, [(evaluation, -1)])
+
+def summarize(doc):
+    """Dashboard view of an analytics document: means, standard deviations, histogram and question rates."""
+    count = doc.get("count", 0)
+    summary = {"scope": doc.get("scope"), "count": count, "updatedDate": doc.get("updatedDate")}
+    for field in ("score", "percentage"):
+        mean = doc.get(f"{field}_sum", 0) / count if count else None
+        variance = doc.get(f"{field}_sq_sum", 0) / count - mean * mean if count else None
+        summary[f"mean_{field}"] = round(mean, 2) if mean is not None else None
+        summary[f"stddev_{field}"] = round(math.sqrt(max(variance, 0)), 2) if variance is not None else None
+    histogram = doc.get("histogram", {})
+    summary["histogram"] = [
+        {"from": i * HISTOGRAM_BIN_WIDTH, "to": (i + 1) * HISTOGRAM_BIN_WIDTH, "count": int(histogram.get(str(i), 0))}
+        for i in range(HISTOGRAM_BINS)
+    ]
+    if "questions" in doc:
+        summary["questions"] = [
+            {
+                "index": int(idx),
+                "question": stats.get("question", ""),
+                "attempts": int(stats.get("attempts", 0)),
+                "correct": int(stats.get("correct", 0)),
+                "correct_rate": round(stats.get("correct", 0) / stats["attempts"], 4) if stats.get("attempts") else None,
+            }
+            for idx, stats in sorted(doc["questions"].items(), key=lambda item: int(item[0]))
+        ]
+    for field in ("subject", "form_id"):
+        if field in doc:
+            summary[field] = doc[field]
+    return summary
+
+def rebuild_analytics(db, batch_size=500):
+    """Recompute quiz_analytics from every evaluated response in user_response."""
+    db.quiz_analytics.delete_many({})
+    query = {"percentage": {"$ne": None}, "subject": {"$nin": [None, ""]}, "form_id": {"$nin": [None, ""]}}
+    fields = {"subject": 1, "form_id": 1, "score": 1, "percentage": 1, "question_results": 1}
+    processed = 0
+    for evaluation in db.user_response.find(query, fields).batch_size(batch_size):
+        record_evaluation(db.quiz_analytics, evaluation)
+        processed += 1
+    db.user_response.update_many(query, {"$set": {"analytics_version": ANALYTICS_VERSION}})
+    print(f"Rebuilt quiz analytics from {processed} evaluations")
+    return processed
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Maintain the quiz_analytics collection")
+    parser.add_argument("--uri", default=os.getenv("MONGODB_URI", "mongodb://localhost:27017/"))
+    parser.add_argument("--database", default="eduquiz")
+    parser.add_argument("--rebuild", action="store_true", help="Recompute analytics from user_response")
+    args = parser.parse_args(argv)
+    if not args.rebuild:
+        parser.print_help()
+        return 0
+    rebuild_analytics(MongoClient(args.uri)[args.database])
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,140 @@
+"""LLM-free coverage retrieval for the quiz generator.
+
+CoverageRetriever picks chunks that spread across the whole document instead of
+the chunks closest to a query, using only the embeddings already stored in the
+FAISS index:
+
+    mmr     maximal marginal relevance against the document centroid: each pick is
+            representative of the document but unlike the chunks already picked
+    kmeans  k-means over the chunk embeddings; the chunk nearest each centroid is
+            picked, one per topic cluster
+
+Both are seeded and deterministic, so the same document yields the same chunks
+(and therefore the same prompts, which keeps the LLM cache effective). Picked
+chunks are returned in document order.
+
+pack_documents then fits retrieved chunks into a token budget, most
+representative and least redundant first, so prompt size stays predictable
+whichever retriever produced them.
+"""
+from typing import Any, List
+
+import numpy as np
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+
+COVERAGE_METHODS = ("mmr", "kmeans")
+
+def _unit_rows(matrix):
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return matrix / np.maximum(norms, 1e-12)
+
+def mmr_coverage(vectors, k, lambda_mult=0.5):
+    """Row indexes chosen greedily by MMR, with the document centroid standing in for the query."""
+    vectors = _unit_rows(vectors)
+    centroid = vectors.mean(axis=0)
+    relevance = vectors @ (centroid / max(np.linalg.norm(centroid), 1e-12))
+    selected = [int(np.argmax(relevance))]
+    # Highest similarity of every row to anything selected so far, updated per pick
+    redundancy = vectors @ vectors[selected[0]]
+    while len(selected) < min(k, len(vectors)):
+        scores = lambda_mult * relevance - (1 - lambda_mult) * redundancy
+        scores[selected] = -np.inf
+        pick = int(np.argmax(scores))
+        selected.append(pick)
+        redundancy = np.maximum(redundancy, vectors @ vectors[pick])
+    return selected
+
+def kmeans_coverage(vectors, k, iterations=20, seed=0):
+    """Row indexes of the chunk nearest each k-means centroid (k-means++ initialisation)."""
+    vectors = _unit_rows(vectors)
+    n = len(vectors)
+    if n <= k:
+        return list(range(n))
+    rng = np.random.default_rng(seed)
+    squared_norms = (vectors ** 2).sum(axis=1)
+
+    def squared_distances(centroids):
+        return np.maximum(squared_norms[:, None] - 2 * vectors @ centroids.T + (centroids ** 2).sum(axis=1)[None, :], 0)
+
+    centroids = [vectors[rng.integers(n)]]
+    closest = squared_distances(np.array(centroids))[:, 0]
+    for _ in range(1, k):
+        total = closest.sum()
+        index = rng.choice(n, p=closest / total) if total > 0 else rng.integers(n)
+        centroids.append(vectors[index])
+        closest = np.minimum(closest, squared_distances(vectors[index][None, :])[:, 0])
+    centroids = np.array(centroids)
+
+    for _ in range(iterations):
+        labels = squared_distances(centroids).argmin(axis=1)
+        updated = centroids.copy()
+        for cluster in range(k):
+            members = vectors[labels == cluster]
+            if len(members):
+                updated[cluster] = members.mean(axis=0)
+        if np.allclose(updated, centroids):
+            break
+        centroids = updated
+
+    selected = []
+    distances = squared_distances(centroids)
+    for cluster in range(k):
+        # Each cluster contributes its nearest chunk not already taken by another cluster
+        for index in np.argsort(distances[:, cluster]):
+            if int(index) not in selected:
+                selected.append(int(index))
+                break
+    return selected
+
+class CoverageRetriever(BaseRetriever):
+    """Retriever that ignores the query and returns k chunks covering a FAISS vector store."""
+
+    vectorstore: Any
+    k: int = 8
+    method: str = "kmeans"
+    lambda_mult: float = 0.5
+    seed: int = 0
+
+    def select_indexes(self):
+        index = self.vectorstore.index
+        if index.ntotal == 0:
+            return []
+        vectors = index.reconstruct_n(0, index.ntotal)
+        if self.method == "mmr":
+            selected = mmr_coverage(vectors, self.k, self.lambda_mult)
+        elif self.method == "kmeans":
+            selected = kmeans_coverage(vectors, self.k, seed=self.seed)
+        else:
+            raise ValueError(f"Unknown coverage method {self.method}; expected one of {', '.join(COVERAGE_METHODS)}")
+        return sorted(selected)
+
+    def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun) -> List[Document]:
+        docstore = self.vectorstore.docstore
+        ids = self.vectorstore.index_to_docstore_id
+        return [docstore.search(ids[i]) for i in self.select_indexes()]
+
+def pack_documents(documents, vectors, budget, count_tokens, lambda_mult=0.5):
+    """Choose documents in MMR order until the token budget is spent.
+
+    Returns (packed documents in MMR order, tokens used). Documents that do not fit
+    are skipped in favour of smaller later ones; if even the first does not fit it is
+    cut down to the budget so the prompt is never empty.
+    """
+    if not documents:
+        return [], 0
+    order = mmr_coverage(np.asarray(vectors, dtype=np.float32), len(documents), lambda_mult)
+    packed = []
+    used = 0
+    for i in order:
+        tokens = count_tokens(documents[i])
+        if used + tokens <= budget:
+            packed.append(documents[i])
+            used += tokens
+    if not packed:
+        text = documents[order[0]]
+        tokens = count_tokens(text)
+        text = text[:max(1, len(text) * budget // max(tokens, 1))]
+        packed, used = [text], count_tokens(text)
+    return packed, used
@@ -0,0 +1,17 @@
+"""Entry point for the quiz generator API.
+
+app.py loads the embedding model and opens database, Google and LLM clients
+when it is imported. Worker processes started with the "spawn" method (the PDF
+extraction pool in document_stream.py) re-import the main script, so the main
+script must be this thin module rather than app.py; app is only imported under
+the __main__ guard below, which spawned workers skip.
+
+    python server.py    (python app.py forwards here)
+"""
+import os
+
+if __name__ == "__main__":
+    from app import app
+
+    print("Starting Flask server...")
+    app.run(debug=True, host='0.0.0.0', port=int(os.environ.get('PORT', 5000)))
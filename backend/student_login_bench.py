@@ -0,0 +1,139 @@
+"""Round-trip and latency benchmark for the student_login classroom query.
+
+Seeds a scratch database with one student enrolled in a grid of classroom and
+quiz counts, then runs the per-quiz find_one lookups student_login used to do
+and the batched classroom_queries.student_classrooms against it. Round trips
+are counted with a pymongo command listener, so the numbers reflect what
+reaches the server. The scratch database is dropped afterwards.
+
+Examples:
+    python student_login_bench.py
+    python student_login_bench.py --uri mongodb://db:27017/ --classrooms 1,8,32 --quizzes 1,5,20 --json results.json
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+from bson.objectid import ObjectId
+from pymongo import MongoClient, monitoring
+
+from classroom_queries import student_classrooms
+
+BENCH_EMAIL = "bench-student@example.com"
+
+class RoundTripCounter(monitoring.CommandListener):
+    def __init__(self):
+        self.count = 0
+
+    def started(self, event):
+        self.count += 1
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        pass
+
+def legacy_student_classrooms(classroom_collection, quiz_collection, email):
+    """The query pattern student_login used before: one find_one per quiz id."""
+    classrooms_list = []
+    for c in classroom_collection.find({"students.email": email}):
+        quizzes = []
+        for q in c.get("quizzes", []):
+            quiz_id = ObjectId(q) if isinstance(q, str) else q
+            quiz = quiz_collection.find_one({"_id": quiz_id})
+            if quiz:
+                quizzes.append({
+                    "_id": str(quiz["_id"]),
+                    "title": quiz.get("title", ""),
+                    "googleFormLink": quiz.get("googleFormLink", ""),
+                    "name": quiz.get("name", ""),
+                    "subject": quiz.get("subject", "")
+                })
+        classrooms_list.append({
+            "_id": str(c["_id"]),
+            "name": c.get("name", ""),
+            "subject": c.get("subject", ""),
+            "quizzes": quizzes
+        })
+    return classrooms_list
+
+def seed(db, classroom_count, quiz_count, other_students=30):
+    """Enrol BENCH_EMAIL in classroom_count classrooms with quiz_count quizzes each."""
+    db.classrooms.delete_many({})
+    db.quizzes.delete_many({})
+    questions = [{"question": f"Question {i}?", "options": ["A. a", "B. b", "C. c", "D. d"],
+                  "correct_answer": "A. a", "explanation": "Because."} for i in range(10)]
+    for c in range(classroom_count):
+        quiz_ids = db.quizzes.insert_many([
+            {"title": f"Quiz {q} for Class {c}", "name": f"Class {c}", "subject": "Bench",
+             "googleFormLink": f"https://docs.google.com/forms/d/bench-{c}-{q}/viewform", "questions": questions}
+            for q in range(quiz_count)
+        ]).inserted_ids
+        students = [{"email": f"student{i}@example.com"} for i in range(other_students)] + [{"email": BENCH_EMAIL}]
+        db.classrooms.insert_one({"name": f"Class {c}", "subject": "Bench", "teacher": "Bench Teacher",
+                                  "students": students, "quizzes": quiz_ids, "status": "active"})
+
+def measure(fn, db, counter, repeat):
+    latencies = []
+    round_trips = 0
+    result = None
+    for _ in range(repeat):
+        counter.count = 0
+        started = time.perf_counter()
+        result = fn(db.classrooms, db.quizzes, BENCH_EMAIL)
+        latencies.append(time.perf_counter() - started)
+        round_trips = counter.count
+    samples = np.asarray(latencies) * 1000
+    return result, {
+        "round_trips": round_trips,
+        "p50_ms": round(float(np.percentile(samples, 50)), 3),
+        "p95_ms": round(float(np.percentile(samples, 95)), 3),
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark student_login classroom queries")
+    parser.add_argument("--uri", default=os.getenv("MONGODB_URI", "mongodb://localhost:27017/"))
+    parser.add_argument("--database", default="eduquiz_bench", help="Scratch database (dropped afterwards)")
+    parser.add_argument("--classrooms", default="1,4,8,16", help="Comma-separated classroom counts")
+    parser.add_argument("--quizzes", default="1,3,10", help="Comma-separated quizzes per classroom")
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--json", help="Write the full report to this file")
+    args = parser.parse_args(argv)
+
+    counter = RoundTripCounter()
+    client = MongoClient(args.uri, event_listeners=[counter])
+    db = client[args.database]
+    db.classrooms.create_index("students.email")
+
+    reports = []
+    header = f"{'classrooms':>10}{'quizzes':>9}{'legacy trips':>14}{'legacy p50':>12}{'batched trips':>15}{'batched p50':>13}{'speedup':>9}"
+    print(header)
+    print("-" * len(header))
+    try:
+        for classroom_count in (int(v) for v in args.classrooms.split(",")):
+            for quiz_count in (int(v) for v in args.quizzes.split(",")):
+                seed(db, classroom_count, quiz_count)
+                legacy_result, legacy = measure(legacy_student_classrooms, db, counter, args.repeat)
+                batched_result, batched = measure(student_classrooms, db, counter, args.repeat)
+                if legacy_result != batched_result:
+                    print(f"MISMATCH at {classroom_count} classrooms x {quiz_count} quizzes")
+                    return 1
+                speedup = legacy["p50_ms"] / batched["p50_ms"] if batched["p50_ms"] else None
+                reports.append({"classrooms": classroom_count, "quizzes": quiz_count,
+                                "legacy": legacy, "batched": batched, "speedup": speedup})
+                print(f"{classroom_count:>10}{quiz_count:>9}{legacy['round_trips']:>14}{legacy['p50_ms']:>12.2f}"
+                      f"{batched['round_trips']:>15}{batched['p50_ms']:>13.2f}{speedup or 0:>9.1f}")
+    finally:
+        client.drop_database(args.database)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(reports, f, indent=2)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -8,6 +8,8 @@ const TeacherDashboard = () => {
   const [classrooms, setClassrooms] = useState([]);
   const [showCreateForm, setShowCreateForm] = useState(false);
   const [isGenerating, setIsGenerating] = useState(false);
+  const [streamedQuestions, setStreamedQuestions] = useState([]); // Questions shown while the quiz is generated
+  const [generationStage, setGenerationStage] = useState('');
   const [isLoading, setIsLoading] = useState(true);
   const [newClassroom, setNewClassroom] = useState({
     name: '',
@@ -23,6 +25,8 @@ const TeacherDashboard = () => {
   const [showResultsModal, setShowResultsModal] = useState(false); // New state for modal visibility
   const [resultsLoading, setResultsLoading] = useState(false); // New state for results loading
   const [resultsError, setResultsError] = useState(''); // New state for results error
+  const [resultsQuery, setResultsQuery] = useState(null); // Subject and next page cursor of the open results
+  const [resultsSummary, setResultsSummary] = useState(null); // Materialised analytics for the open results
   const navigate = useNavigate();
 
   // Get teacher data from localStorage
@@ -71,21 +75,33 @@ const TeacherDashboard = () => {
     }
   }, [teacherName]);
 
-  const fetchQuizResults = async (quizName, subject) => {
+  const fetchQuizResults = async (quizName, subject, cursor = null) => {
     setResultsLoading(true);
     setResultsError('');
-    setQuizResults([]);
+    if (!cursor) {
+      setQuizResults([]);
+      setResultsSummary(null);
+    }
     try {
       console.log(`Fetching quiz results for quiz: ${quizName}, subject: ${subject}`);
       const response = await axios.get('http://localhost:5000/api/quiz-results', {
         params: {
           quizName,
           subject,
+          ...(cursor ? { cursor } : {}),
         },
       });
       console.log('Quiz results response:', response.data);
-      setQuizResults(response.data || []);
+      const page = response.data?.results || [];
+      setQuizResults((prev) => (cursor ? [...prev, ...page] : page));
+      setResultsQuery({ quizName, subject, nextCursor: response.data?.next_cursor || null });
       setShowResultsModal(true);
+      if (!cursor) {
+        axios
+          .get('http://localhost:5000/api/quiz-analytics', { params: { subject } })
+          .then((analytics) => setResultsSummary(analytics.data))
+          .catch((analyticsError) => console.error('Error fetching quiz analytics:', analyticsError));
+      }
     } catch (error) {
       console.error('Error fetching quiz results:', error);
       let errorMessage = 'Failed to load quiz results. Please try again.';
@@ -117,6 +133,75 @@ const TeacherDashboard = () => {
     }
   };
 
+  const waitForClassroomJob = async (statusUrl) => {
+    // Poll the background job until it finishes, giving up after 20 minutes
+    const deadline = Date.now() + 20 * 60 * 1000;
+    while (Date.now() < deadline) {
+      await new Promise((resolve) => setTimeout(resolve, 2000));
+      const { data: job } = await axios.get(`http://localhost:5000${statusUrl}`);
+      console.log(`Classroom job ${job.job_id}: ${job.stage} (${job.progress}%)`);
+      if (job.status === 'succeeded') {
+        return job.result;
+      }
+      if (job.status === 'failed') {
+        throw new Error(job.error || 'Classroom creation failed');
+      }
+    }
+    throw new Error('Classroom creation is taking too long; check the classroom list later');
+  };
+
+  const streamClassroomJob = async (formData) => {
+    // Read server-sent events from the streaming create endpoint; returns the job result
+    const response = await fetch('http://localhost:5000/api/classrooms?stream=true', {
+      method: 'POST',
+      body: formData,
+    });
+    if (!response.ok) {
+      const data = await response.json().catch(() => ({}));
+      throw new Error(data.error || `Server error (${response.status})`);
+    }
+
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    let statusUrl = null;
+    while (true) {
+      const { value, done } = await reader.read();
+      if (done) break;
+      buffer += decoder.decode(value, { stream: true });
+      const events = buffer.split('\n\n');
+      buffer = events.pop();
+      for (const rawEvent of events) {
+        let event = 'message';
+        let data = '';
+        for (const line of rawEvent.split('\n')) {
+          if (line.startsWith('event: ')) event = line.slice(7);
+          else if (line.startsWith('data: ')) data += line.slice(6);
+        }
+        if (!data) continue;
+        const payload = JSON.parse(data);
+        if (event === 'job') {
+          statusUrl = payload.status_url;
+        } else if (event === 'stage') {
+          setGenerationStage(payload.stage);
+        } else if (event === 'question') {
+          setStreamedQuestions((prev) => [...prev, payload]);
+        } else if (event === 'questions') {
+          setStreamedQuestions(payload);
+        } else if (event === 'done') {
+          return payload;
+        } else if (event === 'error') {
+          throw new Error(payload.error || 'Classroom creation failed');
+        }
+      }
+    }
+    // The stream dropped before the job finished; keep following it by polling
+    if (statusUrl) {
+      return waitForClassroomJob(statusUrl);
+    }
+    throw new Error('Lost connection while creating the classroom');
+  };
+
   const handleCreateClassroom = async () => {
     if (!newClassroom.name || !newClassroom.document || !newClassroom.studentEmails) {
       setError('Please fill all required fields: Classroom Name, Lesson Document, and Student Emails.');
@@ -134,6 +219,8 @@ const TeacherDashboard = () => {
     }
 
     setIsGenerating(true);
+    setStreamedQuestions([]);
+    setGenerationStage('');
     setError('');
 
     try {
@@ -158,12 +245,9 @@ const TeacherDashboard = () => {
         document: newClassroom.document?.name,
       });
 
-      const response = await axios.post('http://localhost:5000/api/classrooms', formData, {
-        headers: { 'Content-Type': 'multipart/form-data' },
-      });
-
-      console.log('Create classroom response:', response.data);
-      setClassrooms((prev) => [...prev, response.data]);
+      const result = await streamClassroomJob(formData);
+      console.log('Create classroom response:', result);
+      await fetchClassrooms();
 
       setNewClassroom({
         name: '',
@@ -179,7 +263,7 @@ const TeacherDashboard = () => {
       alert('Classroom and quiz created successfully!');
     } catch (error) {
       console.error('Error creating classroom:', error);
-      let errorMessage = error.response?.data?.error || 'Error creating classroom. Please try again.';
+      let errorMessage = error.response?.data?.error || error.message || 'Error creating classroom. Please try again.';
       if (error.response?.status === 401) {
         errorMessage = 'Session expired. Please log in again.';
         localStorage.removeItem('teacherData');
@@ -190,6 +274,8 @@ const TeacherDashboard = () => {
       setError(errorMessage);
     } finally {
       setIsGenerating(false);
+      setStreamedQuestions([]);
+      setGenerationStage('');
     }
   };
 
@@ -385,6 +471,8 @@ const TeacherDashboard = () => {
                       setShowResultsModal(false);
                       setResultsError('');
                       setQuizResults([]);
+                      setResultsQuery(null);
+                      setResultsSummary(null);
                     }}
                     className="text-gray-400 hover:text-gray-600"
                   >
@@ -399,7 +487,36 @@ const TeacherDashboard = () => {
                   </div>
                 )}
 
-                {resultsLoading ? (
+                {resultsSummary && (
+                  <div className="mb-4">
+                    <div className="grid grid-cols-3 gap-3 text-center text-sm">
+                      <div className="p-2 bg-gray-50 rounded-md">
+                        <p className="text-gray-500">Attempts</p>
+                        <p className="font-semibold text-gray-900">{resultsSummary.count}</p>
+                      </div>
+                      <div className="p-2 bg-gray-50 rounded-md">
+                        <p className="text-gray-500">Average</p>
+                        <p className="font-semibold text-gray-900">{resultsSummary.mean_percentage}%</p>
+                      </div>
+                      <div className="p-2 bg-gray-50 rounded-md">
+                        <p className="text-gray-500">Std. deviation</p>
+                        <p className="font-semibold text-gray-900">{resultsSummary.stddev_percentage}</p>
+                      </div>
+                    </div>
+                    <div className="flex items-end h-16 mt-3 space-x-1">
+                      {resultsSummary.histogram.map((bin) => (
+                        <div
+                          key={bin.from}
+                          title={`${bin.from}–${bin.to}%: ${bin.count}`}
+                          className="flex-1 bg-blue-400 rounded-t"
+                          style={{ height: `${(bin.count / Math.max(...resultsSummary.histogram.map((b) => b.count), 1)) * 100}%` }}
+                        ></div>
+                      ))}
+                    </div>
+                  </div>
+                )}
+
+                {resultsLoading && quizResults.length === 0 ? (
                   <div className="flex items-center justify-center py-8">
                     <div className="animate-spin rounded-full h-8 w-8 border-b-2 border-blue-600 mr-2"></div>
                     <span className="text-gray-600">Loading results...</span>
@@ -434,6 +551,17 @@ const TeacherDashboard = () => {
                         ))}
                       </tbody>
                     </table>
+                    {resultsQuery?.nextCursor && (
+                      <div className="flex justify-center pt-4">
+                        <button
+                          onClick={() => fetchQuizResults(resultsQuery.quizName, resultsQuery.subject, resultsQuery.nextCursor)}
+                          disabled={resultsLoading}
+                          className="px-4 py-2 border border-gray-300 rounded-md text-gray-700 hover:bg-gray-50 transition-colors disabled:opacity-50"
+                        >
+                          {resultsLoading ? 'Loading...' : 'Load more'}
+                        </button>
+                      </div>
+                    )}
                   </div>
                 )}
               </div>
@@ -568,6 +696,20 @@ student3@email.com"
                     </p>
                   </div>
 
+                  {isGenerating && (generationStage || streamedQuestions.length > 0) && (
+                    <div className="p-3 bg-blue-50 border border-blue-200 rounded-md text-sm">
+                      <p className="text-blue-700 font-medium mb-2">
+                        {generationStage ? `Stage: ${generationStage.replace(/_/g, ' ')}` : 'Starting...'}
+                        {streamedQuestions.length > 0 && ` — ${streamedQuestions.length} of ${newClassroom.numQuestions} questions ready`}
+                      </p>
+                      <ol className="list-decimal list-inside space-y-1 max-h-48 overflow-y-auto text-gray-700">
+                        {streamedQuestions.map((question, idx) => (
+                          <li key={idx}>{question.question}</li>
+                        ))}
+                      </ol>
+                    </div>
+                  )}
+
                   {error && (
                     <div className="p-3 bg-red-100 text-red-700 rounded-md text-sm flex items-center">
                       <AlertCircle className="h-5 w-5 mr-2" />
@@ -21,7 +21,10 @@ const WebCam = () => {
   const canvasRef = useRef(null);
   const streamRef = useRef(null);
   const intervalRef = useRef(null);
+  const sessionIdRef = useRef(null);
+  const socketRef = useRef(null);
   const apiUrl = 'http://localhost:4000';
+  const wsUrl = 'ws://localhost:4000';
 
   const startProctoring = async () => {
     try {
@@ -47,6 +50,10 @@ const WebCam = () => {
         throw new Error(`Failed to start exam session: ${response.statusText}`);
       }
 
+      const session = await response.json();
+      sessionIdRef.current = session.session_id;
+      openProctorStream(session.session_id);
+
       startFrameProcessing();
       setIsActive(true);
     } catch (err) {
@@ -56,12 +63,39 @@ const WebCam = () => {
     }
   };
 
+  const openProctorStream = (sessionId) => {
+    const socket = new WebSocket(`${wsUrl}/ws/proctor?session_id=${encodeURIComponent(sessionId)}`);
+    socket.binaryType = 'arraybuffer';
+    socket.onmessage = (event) => {
+      const message = JSON.parse(event.data);
+      if (message.type === 'delta') {
+        setProctorData(prev => ({ ...prev, ...message.changes }));
+      } else if (message.type === 'error') {
+        console.error('Proctor stream error:', message.error);
+      }
+    };
+    socket.onerror = (err) => {
+      console.warn('Proctor stream unavailable, falling back to HTTP:', err);
+    };
+    socket.onclose = () => {
+      if (socketRef.current === socket) {
+        socketRef.current = null;
+      }
+    };
+    socketRef.current = socket;
+  };
+
   const stopProctoring = async () => {
     if (intervalRef.current) {
       clearInterval(intervalRef.current);
       intervalRef.current = null;
     }
 
+    if (socketRef.current) {
+      socketRef.current.close();
+      socketRef.current = null;
+    }
+
     if (streamRef.current) {
       streamRef.current.getTracks().forEach(track => track.stop());
       streamRef.current = null;
@@ -71,6 +105,7 @@ const WebCam = () => {
       const response = await fetch(`${apiUrl}/end-exam`, {
         method: 'POST',
         headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({ session_id: sessionIdRef.current }),
       });
       if (!response.ok) {
         console.warn('Failed to end exam session cleanly');
@@ -78,6 +113,7 @@ const WebCam = () => {
     } catch (err) {
       console.error('Error ending exam session:', err);
     }
+    sessionIdRef.current = null;
 
     setIsActive(false);
     setProctorData({
@@ -110,19 +146,30 @@ const WebCam = () => {
         
         context.drawImage(videoRef.current, 0, 0, canvas.width, canvas.height);
         
-        const imageData = canvas.toDataURL('image/jpeg', 0.7);
-        
-        sendFrameToServer(imageData);
+        canvas.toBlob((blob) => {
+          if (!blob) {
+            return;
+          }
+          const socket = socketRef.current;
+          if (socket && socket.readyState === WebSocket.OPEN) {
+            socket.send(blob);
+          } else {
+            sendFrameToServer(blob);
+          }
+        }, 'image/jpeg', 0.7);
       }
     }, 200);
   };
 
-  const sendFrameToServer = async (imageData) => {
+  const sendFrameToServer = async (frameBlob) => {
     try {
       const response = await fetch(`${apiUrl}/process-frame`, {
         method: 'POST',
-        headers: { 'Content-Type': 'application/json' },
-        body: JSON.stringify({ image: imageData }),
+        headers: {
+          'Content-Type': 'image/jpeg',
+          'X-Session-ID': sessionIdRef.current || '',
+        },
+        body: frameBlob,
       });
 
       if (!response.ok) {